@@ -0,0 +1,186 @@
+import os
+import random
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Iterator, List, Optional
+
+import fitz
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+# Local stand-ins for arXiv, LangSmith, LangChain Hub and the Hugging Face endpoint. Each one only
+# implements the calls the pipeline makes, with an optional per-call latency to mimic the network.
+
+VOCABULARY = (
+    "transformer attention graph diffusion policy reward gradient kernel sparse convolution retrieval "
+    "benchmark protein language token embedding latent variational bayesian contrastive supervision "
+    "robustness adversarial quantization distillation federated causal inference optimization theorem"
+).split()
+SECTIONS = ["Abstract", "1 Introduction", "2 Related Work", "3 Method", "4 Experiments", "5 Conclusion", "References"]
+
+
+def synthetic_text(rng, words):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+# Each fixture set needs its own first_id: the paper cache is keyed by ID, so sets sharing IDs would
+# be served each other's text.
+def make_fixture_pdfs(root, count, pages, seed=0, first_id=10000):
+    os.makedirs(root, exist_ok=True)
+    rng = random.Random(seed)
+    ids = []
+    for i in range(count):
+        paper_id = f"2401.{first_id + i:05d}"
+        doc = fitz.open()
+        for p in range(pages):
+            page = doc.new_page()
+            heading = SECTIONS[min(p * len(SECTIONS) // pages, len(SECTIONS) - 1)]
+            page.insert_textbox(fitz.Rect(50, 50, 550, 800), f"{heading}\n{synthetic_text(rng, 450)}", fontsize=8)
+        doc.save(os.path.join(root, f"{paper_id}.pdf"))
+        doc.close()
+        ids.append(paper_id)
+    return ids
+
+
+# Replaces pdf_extract.lookup/download_pdf: serves fixture PDFs in place of the arXiv API and download.
+class FakeArxiv:
+    root = None
+    latency = 0.0
+
+    @classmethod
+    def _path(cls, query):
+        path = os.path.join(cls.root, f"{query.split('v')[0]}.pdf")
+        return path if os.path.exists(path) else None
+
+    @classmethod
+    def lookup(cls, queries):
+        time.sleep(cls.latency)
+        return {q: cls._path(q) for q in queries}
+
+    @classmethod
+    def download_pdf(cls, query, dirpath, result=None):
+        if result is None:
+            result = cls.lookup([query])[query]
+        if result is None:
+            return None, None
+        time.sleep(cls.latency)
+        paper_id = query.split("v")[0]
+        return result, {"entry_id": f"http://arxiv.org/abs/{paper_id}v1", "Title": paper_id}
+
+
+class FakeLangSmith:
+    def __init__(self, examples=0, latency=0.0, seed=0):
+        rng = random.Random(seed)
+        self.latency = latency
+        self.examples = [
+            SimpleNamespace(
+                id=uuid.UUID(int=rng.getrandbits(128)),
+                inputs={"input": f"Abstract\n{synthetic_text(rng, 1500)}"},
+                outputs={"output": synthetic_text(rng, 120)},
+            )
+            for _ in range(examples)
+        ]
+        self.feedback = []
+        self.runs = []
+
+    def _call(self):
+        time.sleep(self.latency)
+
+    def has_dataset(self, dataset_name=None, **kwargs):
+        self._call()
+        return True
+
+    def read_dataset(self, dataset_name=None, **kwargs):
+        self._call()
+        return SimpleNamespace(id="fake-dataset", example_count=len(self.examples), modified_at=len(self.examples))
+
+    def create_dataset(self, dataset_name=None, **kwargs):
+        self._call()
+        return SimpleNamespace(id="fake-dataset")
+
+    def list_examples(self, dataset_name=None, offset=0, **kwargs):
+        self._call()
+        return iter(self.examples[offset:])
+
+    def create_example(self, inputs, outputs, example_id=None, **kwargs):
+        self._call()
+        example = SimpleNamespace(id=example_id or uuid.uuid4(), inputs=inputs, outputs=outputs)
+        self.examples.append(example)
+        return example
+
+    def create_feedback_from_token(self, token_or_url, score=None, *, value=None, correction=None, comment=None, metadata=None):
+        self._call()
+        self.feedback.append((token_or_url, score, comment))
+
+    def create_presigned_feedback_token(self, run_id, feedback_key=None, **kwargs):
+        self._call()
+        return SimpleNamespace(url=f"https://fake.invalid/feedback/{run_id}")
+
+    def create_run(self, **kwargs):
+        self._call()
+        self.runs.append(kwargs)
+
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Summarize the paper inside <summary></summary> tags.\n<examples>\n{examples}\n</examples>"),
+    MessagesPlaceholder(variable_name="messages"),
+])
+OPTIMIZER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Improve the prompt.\n{prompt_versions}\nCurrent:\n{current_prompt}"),
+    ("user", "{conversation}\nFinal: {final_value}"),
+])
+
+
+class FakeHub:
+    def __init__(self, commits=5, latency=0.0):
+        self.latency = latency
+        self.commits = {}
+        self.prompts = {}
+        for _ in range(commits):
+            self.push("louup/tweet-critic-fewshot", SUMMARY_PROMPT)
+        self.push("louup/convo-optimizer", OPTIMIZER_PROMPT)
+
+    # langchainhub.Client
+    def list_commits(self, name, **kwargs):
+        time.sleep(self.latency)
+        return {"commits": [{"commit_hash": h} for h in self.commits.get(name, [])]}
+
+    # langchain.hub
+    def pull(self, ref):
+        time.sleep(self.latency)
+        name, _, commit = ref.partition(":")
+        return self.prompts[(name, commit or self.commits[name][0])]
+
+    def push(self, name, prompt, **kwargs):
+        time.sleep(self.latency)
+        commit = uuid.uuid4().hex[:8]
+        self.commits.setdefault(name, []).insert(0, commit)
+        self.prompts[(name, commit)] = prompt
+        return f"https://fake.invalid/hub/{name}/{commit}"
+
+
+class FakeLLM(LLM):
+    latency: float = 0.05
+    tokens_per_sec: float = 200.0
+    output_tokens: int = 64
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    def _tokens(self) -> List[str]:
+        words = ["<summary>"] + [f" {VOCABULARY[i % len(VOCABULARY)]}" for i in range(self.output_tokens)]
+        return words + ["</summary>\n", "<improved_prompt>", "Summarize the paper.\n{examples}", "</improved_prompt>"]
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        tokens = self._tokens()
+        time.sleep(self.latency + len(tokens) / self.tokens_per_sec)
+        return "".join(tokens)
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        time.sleep(self.latency)
+        for token in self._tokens():
+            time.sleep(1 / self.tokens_per_sec)
+            yield GenerationChunk(text=token)
+
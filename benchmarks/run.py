@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from unittest import mock
+
+# Everything the package writes at import time (queue, indexes, caches) goes to a throwaway directory,
+# and nothing is traced to LangSmith.
+WORKDIR = tempfile.mkdtemp(prefix="paper-summarizer-bench-")
+os.environ["PAPER_SUMMARIZER_CACHE_DIR"] = os.path.join(WORKDIR, "cache")
+os.environ["LANGSMITH_TRACING"] = "false"
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+from benchmarks.fakes import FakeArxiv, FakeHub, FakeLangSmith, FakeLLM, make_fixture_pdfs
+from paper_summarizer.batch import percentile
+
+THRESHOLDS = os.path.join(os.path.dirname(__file__), "thresholds.json")
+
+
+def measure(results, name, fn, repeat):
+    durations = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        durations.append(time.perf_counter() - start)
+    # Allocations are sampled on one extra call; tracemalloc would distort the timings above.
+    tracemalloc.start()
+    fn(repeat)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results[name] = {
+        "n": repeat,
+        "p50_ms": percentile(durations, 50) * 1000,
+        "p95_ms": percentile(durations, 95) * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+def measure_throughput(results, name, fn, total, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(fn, range(total)))
+    elapsed = time.perf_counter() - start
+    results[name] = {"n": total, "concurrency": concurrency, "per_sec": total / elapsed}
+
+def install_fakes(stack, args, langsmith, hub):
+    from paper_summarizer import pdf_extract, resources
+    from paper_summarizer.paper_cache import PaperCache
+    from paper_summarizer.services import huggingface_service
+    from paper_summarizer.services.prompt_registry import PromptRegistry
+    from paper_summarizer.summary_cache import MemoryBackend
+
+    llm = FakeLLM(latency=args.llm_latency, tokens_per_sec=args.token_rate, output_tokens=args.output_tokens)
+    cache = MemoryBackend()
+    registry = PromptRegistry(root=os.path.join(WORKDIR, "prompts"), hub_client=hub, hub=hub)
+    papers = PaperCache(root=os.path.join(WORKDIR, "papers"))
+    stack.enter_context(mock.patch.object(FakeArxiv, "latency", args.network_latency))
+    stack.enter_context(mock.patch.object(pdf_extract, "lookup", FakeArxiv.lookup))
+    stack.enter_context(mock.patch.object(pdf_extract, "download_pdf", FakeArxiv.download_pdf))
+    stack.enter_context(mock.patch.object(resources, "paper_cache", lambda: papers))
+    stack.enter_context(mock.patch.object(resources, "prompt_registry", lambda: registry))
+    stack.enter_context(mock.patch.object(resources, "langsmith_client", lambda: langsmith))
+    stack.enter_context(mock.patch.object(resources, "summary_cache", lambda: cache))
+    # Only the endpoint is faked; get_llm still wraps it, so runs include the admission scheduler.
+    stack.enter_context(mock.patch.object(huggingface_service, "_endpoint", lambda *a, **k: llm))
+    stack.enter_context(mock.patch.object(huggingface_service, "_pool", {}))
+    stack.enter_context(mock.patch.object(huggingface_service, "_lanes", {}))
+
+def fresh_fewshot_index(size, langsmith, stack):
+    from paper_summarizer import resources
+    from paper_summarizer.fewshot_index import FewShotIndex
+    index = FewShotIndex(os.path.join(WORKDIR, f"fewshots-{size}-{time.time_ns()}.sqlite"))
+    stack.enter_context(mock.patch.object(resources, "fewshot_index", lambda: index))
+    stack.enter_context(mock.patch.object(resources, "langsmith_client", lambda: langsmith))
+    return index
+
+def run(args):
+    results = {}
+    fixtures = os.path.join(WORKDIR, "fixtures")
+    short_ids = make_fixture_pdfs(os.path.join(fixtures, "short"), args.papers, args.short_pages, seed=1, first_id=10000)
+    long_ids = make_fixture_pdfs(os.path.join(fixtures, "long"), args.papers, args.long_pages, seed=2, first_id=20000)
+
+    from paper_summarizer import arxiv_fetcher, feedback_queue, resources, summarizer
+    from paper_summarizer.services import langchain_service
+
+    # Cold start: what a fresh Streamlit process pays to import the pipeline before drawing anything
+    imports = "import paper_summarizer.arxiv_fetcher, paper_summarizer.feedback_queue, paper_summarizer.summarizer"
+    measure(results, "cold_import", lambda i: subprocess.run([sys.executable, "-c", imports], check=True), args.repeat)
+
+    langsmith = FakeLangSmith(examples=args.dataset_sizes[0], latency=args.network_latency)
+    hub = FakeHub(commits=args.hub_commits, latency=args.network_latency)
+    with ExitStack() as stack:
+        install_fakes(stack, args, langsmith, hub)
+        fresh_fewshot_index(args.dataset_sizes[0], langsmith, stack)
+
+        # arXiv fetch + PyMuPDF extraction, then the on-disk cache
+        for label, ids, pages in (("short", short_ids, args.short_pages), ("long", long_ids, args.long_pages)):
+            FakeArxiv.root = os.path.join(fixtures, label)
+            measure(results, f"fetch_cold[{pages}p]", lambda i: arxiv_fetcher.fetch_arxiv_full_text(f"{ids[i % len(ids)]}v{i + 2}"), args.repeat)
+            measure(results, f"first_section[{pages}p]", lambda i: next(iter(arxiv_fetcher.stream_arxiv_paper(f"{ids[i % len(ids)]}v{i + 100}"))), args.repeat)
+            reading_list = lambda i: " ".join(f"https://arxiv.org/abs/{paper_id}v{i + 1000}" for paper_id in ids)
+            measure(results, f"fetch_batch_cold[{len(ids)}x{pages}p]", lambda i: arxiv_fetcher.fetch_arxiv_papers(reading_list(i)), args.repeat)
+            measure(results, f"fetch_warm[{pages}p]", lambda i: arxiv_fetcher.fetch_arxiv_full_text(ids[i % len(ids)]), args.repeat)
+        FakeArxiv.root = os.path.join(fixtures, "short")
+        short_papers = [arxiv_fetcher.fetch_arxiv_full_text(i) for i in short_ids]
+        FakeArxiv.root = os.path.join(fixtures, "long")
+        long_papers = [arxiv_fetcher.fetch_arxiv_full_text(i) for i in long_ids]
+
+        # Few-shot selection as the dataset grows
+        for size in args.dataset_sizes:
+            with ExitStack() as inner:
+                sized = FakeLangSmith(examples=size, latency=args.network_latency)
+                measure(results, f"fewshot_sync[{size}]", lambda i: fresh_fewshot_index(size, sized, inner).sync(sized), 1)
+                measure(results, f"few_shot_examples[{size}]", lambda i: langchain_service.few_shot_examples(short_papers[i % len(short_papers)]["content"]), args.repeat)
+
+        measure(results, "get_prompt_with_fewshots", lambda i: langchain_service.get_prompt_with_fewshots(""), args.repeat)
+
+        # Summaries: single-shot, map-reduce, cached
+        def summarize(papers, cached=False):
+            def call(i):
+                paper = papers[i % len(papers)]
+                key = f"{paper['id']}{paper['version']}" if cached else None
+                return summarizer.summarizer_pipeline([("user", paper["content"])], 1.0, key)
+            return call
+
+        measure(results, f"summarize[{args.short_pages}p]", summarize(short_papers), args.repeat)
+        measure(results, f"summarize[{args.long_pages}p]", summarize(long_papers), args.repeat)
+        # The map phase alone: with chunks summarized in parallel this stays near one LLM call per
+        # MAP_MAX_CONCURRENCY chunks instead of growing with every chunk of the paper.
+        measure(results, f"map_reduce[{args.long_pages}p]", lambda i: summarizer._map_reduce([("user", long_papers[i % len(long_papers)]["content"])], 1.0), args.repeat)
+        summarize(short_papers, cached=True)(0)
+        measure(results, "summarize_cached", lambda i: summarize(short_papers, cached=True)(0), args.repeat)
+
+        def first_token(i):
+            stream = summarizer.stream_summary([("user", short_papers[i % len(short_papers)]["content"])])
+            next(iter(stream))
+        measure(results, "time_to_first_token", first_token, args.repeat)
+
+        # Sessions pasting the same paper at once share a single generation
+        def burst(i):
+            paper, key = short_papers[0], f"{short_papers[0]['id']}-burst-{time.time_ns()}"
+            with ThreadPoolExecutor(args.burst) as pool:
+                list(pool.map(lambda _: summarizer.summarizer_pipeline([("user", paper["content"])], 1.0, key), range(args.burst)))
+        measure(results, f"summarize_burst[{args.burst}]", burst, args.repeat)
+
+        for concurrency in args.concurrency:
+            measure_throughput(results, f"summarize_throughput[c={concurrency}]", summarize(short_papers), args.repeat * concurrency, concurrency)
+
+        # Feedback handlers and prompt optimization
+        def feedback(i):
+            url = f"https://fake.invalid/feedback/{time.time_ns()}-{i}"
+            feedback_queue.enqueue_feedback({"score": "👍", "text": "good"}, url, short_papers[0]["content"], "edited summary")
+
+        def drain(_):
+            for event in resources.feedback_queue().claim(["feedback", "example"], 100):
+                feedback_queue.HANDLERS[event.kind](event.payload, event.idem_key)
+                resources.feedback_queue().ack([event.id])
+
+        with mock.patch.object(feedback_queue, "start_worker", lambda: None):
+            measure(results, "enqueue_feedback", feedback, args.repeat)
+            measure(results, "drain_feedback", drain, 1)
+        measure(results, "update_prompt_from_feedback", lambda i: langchain_service.update_prompt_from_feedback("👍", "edited summary"), args.repeat)
+    return results
+
+def check(results, thresholds):
+    failures = []
+    for name, limits in thresholds.items():
+        if name not in results:
+            continue
+        for metric, limit in limits.items():
+            value = results[name].get(metric)
+            too_low = metric == "per_sec"
+            if value is not None and (value < limit if too_low else value > limit):
+                failures.append(f"{name}: {metric}={value:.2f} ({'min' if too_low else 'max'} {limit})")
+    return failures
+
+def report(results, stream=sys.stdout):
+    for name, r in results.items():
+        if "per_sec" in r:
+            print(f"{name:<36} n={r['n']:<5} {r['per_sec']:.2f}/s", file=stream)
+        else:
+            print(f"{name:<36} n={r['n']:<5} p50={r['p50_ms']:9.2f}ms p95={r['p95_ms']:9.2f}ms peak={r['peak_kib']:9.1f}KiB", file=stream)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the summarization pipeline against local fakes.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--papers", type=int, default=3)
+    parser.add_argument("--short-pages", type=int, default=8)
+    parser.add_argument("--long-pages", type=int, default=40)
+    parser.add_argument("--dataset-sizes", type=lambda v: [int(x) for x in v.split(",")], default=[10, 100, 1000])
+    parser.add_argument("--hub-commits", type=int, default=20)
+    parser.add_argument("--concurrency", type=lambda v: [int(x) for x in v.split(",")], default=[1, 4, 16])
+    parser.add_argument("--burst", type=int, default=16, help="concurrent sessions summarizing the same paper")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds before the fake LLM's first token")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="fake LLM tokens per second")
+    parser.add_argument("--output-tokens", type=int, default=64)
+    parser.add_argument("--network-latency", type=float, default=0.0, help="seconds added to every fake service call")
+    parser.add_argument("--thresholds", default=THRESHOLDS)
+    parser.add_argument("--json", help="also write raw results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.thresholds:
+        with open(args.thresholds) as f:
+            failures = check(results, json.load(f))
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,13 @@
 import streamlit as st
+from paper_summarizer import resources
 from paper_summarizer.arxiv_fetcher import fetch_arxiv_full_text
-from paper_summarizer.summarizer import summarizer_pipeline
+from paper_summarizer.doc_store import describe, paper_handle
+from paper_summarizer.services.llm_scheduler import LLMUnavailable
+from paper_summarizer.summarizer import stream_summary
 from paper_summarizer.feedback import handle_feedback, display_feedback_ui
 
 st.set_page_config(page_title="Paper Summarizer", page_icon="📄🧠")
+resources.startup()
 st.sidebar.title("Session Info")
 temperature = st.sidebar.slider("Temperature", 0.0, 1.5, 1.0, 0.1)
 
@@ -19,20 +23,33 @@ else:
 
     if user_input := st.chat_input("Paste arXiv ID or link here..."):
         st.chat_message("user").write(user_input)
-        paper_id = fetch_arxiv_full_text(user_input)
-        if paper_id:
-            content = paper_id["content"]
-            messages.append(("user", content))
+        paper = fetch_arxiv_full_text(user_input)
+        if paper:
+            # The session keeps a handle to the paper, not its text; see paper_summarizer.doc_store.
+            handle = paper_handle(paper)
+            messages.append(("user", handle))
             st.session_state["langchain_messages"] = messages
 
-            summary, presigned_url = summarizer_pipeline(messages, temperature)
+            stream = stream_summary(messages, temperature)
+            with st.chat_message("assistant"):
+                placeholder = st.empty()
+                try:
+                    for _ in stream:
+                        placeholder.markdown(stream.text + "▌")
+                except LLMUnavailable:
+                    placeholder.empty()
+                    messages.pop()
+                    st.error("The model is busy right now. Please try again in a minute.")
+                    st.stop()
+                placeholder.empty()
+            summary, presigned_url = stream.text, stream.presigned_url
             messages.append(("assistant", summary, presigned_url))
             st.session_state["langchain_messages"] = messages
 
-            display_feedback_ui(messages, summary, presigned_url, content)
+            display_feedback_ui(messages, summary, presigned_url, handle)
         else:
             st.error("Could not fetch paper from arXiv ID.")
     else:
         for i, msg in enumerate(messages):
             with st.chat_message(msg[0]):
-                st.markdown(msg[1])
+                st.markdown(describe(msg[1]))
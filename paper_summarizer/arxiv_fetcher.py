@@ -1,13 +1,120 @@
 import re
-from langchain_community.document_loaders import ArxivLoader
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from paper_summarizer import pdf_extract, resources
+from paper_summarizer.config import ARXIV_DOWNLOAD_WORKERS, PDF_STOP_AT_BACK_MATTER
+from paper_summarizer.metrics import cache_result, span
+from paper_summarizer.singleflight import SingleFlight
+
+# New-style IDs with a 4- or 5-digit suffix (0704.0001, 2404.12345) and old-style archive IDs
+# (hep-th/9901001, math.GT/0309136, cond-mat.str-el/0101001), each with an optional version, bare or
+# inside abs/pdf links.
+ARXIV_ID = re.compile(r"(?<![\w.-])(\d{4}\.\d{4,5}|[a-z][a-z-]*(?:\.[A-Za-z-]+)?/\d{7})(v\d+)?(?![\d])")
+# arXiv's canonical form of an old-style ID drops the subject class (math.GT/0309136 -> math/0309136);
+# lookups and cache keys only ever see that form.
+SUBJECT_CLASS = re.compile(r"^([a-z-]+)\.[A-Za-z-]+/")
+
+def parse_arxiv_ids(input_text: str):
+    ids = ((SUBJECT_CLASS.sub(r"\1/", paper_id), version) for paper_id, version in (m.groups() for m in ARXIV_ID.finditer(input_text)))
+    return list(dict.fromkeys(ids))
+
+def parse_arxiv_id(input_text: str):
+    ids = parse_arxiv_ids(input_text)
+    return ids[0] if ids else None
+
+# Iterating yields the paper's sections (pdf_extract.Section) as they are parsed, from the paper cache or
+# from the downloaded PDF page by page. Once exhausted, the stream carries the version, metadata and full
+# content, and a fresh download has been written to the cache.
+class PaperStream:
+    def __init__(self, paper_id, version=None, stop_at_back_matter=PDF_STOP_AT_BACK_MATTER, result=None):
+        self.id = paper_id
+        self.version = version
+        self.stop_at_back_matter = stop_at_back_matter
+        self.metadata = None
+        self.sections = []
+        self.cache_hit = False
+        # arXiv search result resolved up front by resolve_papers; looked up on demand otherwise.
+        self.result = result
+        self.unknown = False
+
+    @property
+    def query(self):
+        return f"{self.id}{self.version or ''}"
+
+    @property
+    def content(self):
+        return "".join(s.text for s in self.sections)
+
+    def as_dict(self):
+        return {"id": self.id, "version": self.version, "content": self.content, "metadata": self.metadata}
+
+    def _sections(self):
+        paper_cache = resources.paper_cache()
+        with span("paper_cache_read"):
+            cached = paper_cache.get(self.id, self.version)
+        cache_result("paper", cached is not None)
+        if cached:
+            self.cache_hit = True
+            self.version, self.metadata = cached["version"], cached["metadata"]
+            yield from pdf_extract.sections_from_text(cached["content"])
+            return
+        if self.unknown:
+            return
+        with tempfile.TemporaryDirectory(prefix="arxiv-") as tmp:
+            with span("arxiv_download"):
+                path, metadata = pdf_extract.download_pdf(self.query, tmp, self.result)
+            if path is None:
+                return
+            version_match = re.search(r"(v\d+)$", metadata.get("entry_id", ""))
+            self.version = self.version or (version_match.group(1) if version_match else "v1")
+            self.metadata = metadata
+            yield from pdf_extract.extract_sections(path, self.stop_at_back_matter)
+        if self.sections:
+            with span("paper_cache_write"):
+                paper_cache.put(self.id, self.version, self.content, self.metadata)
+
+    def __iter__(self):
+        for section in self._sections():
+            self.sections.append(section)
+            yield section
+
+def stream_arxiv_paper(input_text: str):
+    parsed = parse_arxiv_id(input_text)
+    return PaperStream(*parsed) if parsed else None
+
+paper_flights = SingleFlight("paper")
+
+def _collect(stream):
+    for _ in stream:
+        pass
+    return stream.as_dict() if stream.sections else None
+
+# Sessions asking for the same paper at the same time share one download and extraction.
+def collect_paper(stream):
+    paper = paper_flights.do(stream.query, lambda: _collect(stream))
+    return dict(paper) if paper else None
 
 def fetch_arxiv_full_text(input_text: str):
-    paper_id_match = re.search(r"(\d{4}\.\d{5})", input_text)
-    if not paper_id_match:
-        return None
-    paper_id = paper_id_match.group(1)
-    loader = ArxivLoader(query=paper_id, load_max_docs=1)
-    docs = loader.load()
-    if docs:
-        return {"id": paper_id, "content": docs[0].page_content}
-    return None
+    stream = stream_arxiv_paper(input_text)
+    return collect_paper(stream) if stream else None
+
+# Resolves every uncached stream with a single batched arXiv query, so the downloads that follow
+# need no further search round trips. IDs arXiv does not know are marked and yield nothing.
+def resolve_papers(streams):
+    paper_cache = resources.paper_cache()
+    misses = [s for s in streams if s.result is None and not paper_cache.has(s.id, s.version)]
+    if not misses:
+        return
+    with span("arxiv_lookup"):
+        resolved = pdf_extract.lookup([s.query for s in misses])
+    for stream in misses:
+        stream.result = resolved[stream.query]
+        stream.unknown = stream.result is None
+
+# Every paper referenced in the input, downloaded and extracted concurrently after one lookup.
+# Results follow input order, with None for papers that could not be found.
+def fetch_arxiv_papers(input_text: str, max_workers=ARXIV_DOWNLOAD_WORKERS):
+    streams = [PaperStream(paper_id, version) for paper_id, version in parse_arxiv_ids(input_text)]
+    resolve_papers(streams)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(collect_paper, streams))
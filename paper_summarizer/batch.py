@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from paper_summarizer.arxiv_fetcher import PaperStream, collect_paper, parse_arxiv_ids, resolve_papers
+from paper_summarizer.config import BATCH_FETCH_WORKERS, BATCH_LLM_WORKERS
+from paper_summarizer.metrics import start_metrics_server
+from paper_summarizer.services.llm_scheduler import BACKGROUND
+from paper_summarizer.summarizer import summarizer_pipeline
+
+
+def read_ids(lines):
+    ids = {}
+    for line in lines:
+        for paper_id, version in parse_arxiv_ids(line):
+            ids[f"{paper_id}{version or ''}"] = None
+    return list(ids)
+
+# The output file doubles as the checkpoint: any ID with a written summary is skipped on rerun.
+def completed_ids(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "summary" in record:
+                done.add(record["input"])
+    return done
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))] if values else 0.0
+
+def run(ids, output, temperature=1.0, fetch_workers=BATCH_FETCH_WORKERS, llm_workers=BATCH_LLM_WORKERS):
+    timings = {"fetch": [], "summarize": []}
+    counts = {"ok": 0, "failed": 0}
+    lock = threading.Lock()
+    llm_futures = []
+
+    def write(record):
+        with lock:
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            counts["ok" if "summary" in record else "failed"] += 1
+
+    def summarize(arxiv_id, paper, fetch_seconds):
+        start = time.perf_counter()
+        try:
+            summary, feedback_url = summarizer_pipeline(
+                [("user", paper["content"])], temperature, f"{paper['id']}{paper['version']}", lane=BACKGROUND
+            )
+        except Exception as exc:
+            return write({"input": arxiv_id, "error": repr(exc)})
+        elapsed = time.perf_counter() - start
+        with lock:
+            timings["summarize"].append(elapsed)
+        write({
+            "input": arxiv_id, "id": paper["id"], "version": paper["version"], "summary": summary,
+            "feedback_url": feedback_url, "fetch_seconds": fetch_seconds, "summarize_seconds": elapsed,
+        })
+
+    # Fetches run in their own pool and hand papers to the LLM pool as they arrive, so downloads
+    # overlap with generation instead of alternating with it.
+    def fetch(arxiv_id):
+        start = time.perf_counter()
+        try:
+            paper = collect_paper(streams[arxiv_id])
+        except Exception as exc:
+            return write({"input": arxiv_id, "error": repr(exc)})
+        elapsed = time.perf_counter() - start
+        if not paper:
+            return write({"input": arxiv_id, "error": "paper not found"})
+        with lock:
+            timings["fetch"].append(elapsed)
+            llm_futures.append(llm_pool.submit(summarize, arxiv_id, paper, elapsed))
+
+    started = time.perf_counter()
+    streams = {i: PaperStream(*parse_arxiv_ids(i)[0]) for i in ids}
+    try:
+        resolve_papers(list(streams.values()))
+    except Exception as exc:
+        # Streams left unresolved fall back to one lookup each while downloading.
+        print(f"Batched arXiv lookup failed, resolving papers one by one: {exc!r}", file=sys.stderr)
+    with open(output, "a") as out, ThreadPoolExecutor(fetch_workers) as fetch_pool, ThreadPoolExecutor(llm_workers) as llm_pool:
+        wait([fetch_pool.submit(fetch, i) for i in ids])
+        wait(llm_futures)
+    return counts, timings, time.perf_counter() - started
+
+def report(counts, timings, elapsed, stream=sys.stderr):
+    rate = counts["ok"] / elapsed * 60 if elapsed else 0.0
+    print(f"{counts['ok']} summarized, {counts['failed']} failed in {elapsed:.1f}s ({rate:.2f} papers/min)", file=stream)
+    for stage, values in timings.items():
+        p50, p90, p99 = (percentile(values, q) for q in (50, 90, 99))
+        print(f"  {stage:<10} n={len(values):<5} p50={p50:.2f}s p90={p90:.2f}s p99={p99:.2f}s", file=stream)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a list of arXiv papers to JSONL.")
+    parser.add_argument("ids", nargs="?", default="-", help="file with one arXiv ID or link per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="summaries.jsonl")
+    parser.add_argument("-t", "--temperature", type=float, default=1.0)
+    parser.add_argument("--fetch-workers", type=int, default=BATCH_FETCH_WORKERS)
+    parser.add_argument("--llm-workers", type=int, default=BATCH_LLM_WORKERS)
+    args = parser.parse_args(argv)
+    start_metrics_server()
+
+    if args.ids == "-":
+        ids = read_ids(sys.stdin)
+    else:
+        with open(args.ids) as f:
+            ids = read_ids(f)
+    done = completed_ids(args.output)
+    todo = [i for i in ids if i not in done]
+    print(f"{len(ids)} papers, {len(ids) - len(todo)} already done, {len(todo)} to summarize", file=sys.stderr)
+    report(*run(todo, args.output, args.temperature, args.fetch_workers, args.llm_workers))
+
+if __name__ == "__main__":
+    main()
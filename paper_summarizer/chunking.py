@@ -0,0 +1,56 @@
+import re
+from paper_summarizer.config import CHARS_PER_TOKEN, CHUNK_TOKEN_BUDGET, COMPACT_EXAMPLE_TOKENS
+
+# Numbered headings ("3 Method", "4.2. Ablations") or the usual unnumbered ones on a line of their own.
+SECTION_HEADING = re.compile(
+    r"^(?:\d+(?:\.\d+)*\.?\s+[A-Z][^\n]{0,80}"
+    r"|(?:Abstract|Introduction|Related Work|Background|Methods?|Methodology|Experiments?|Results|"
+    r"Discussion|Conclusions?|References|Bibliography|Appendix|Acknowledge?ments)\b[^\n]{0,40})$",
+    re.MULTILINE,
+)
+COMPACT_SECTIONS = re.compile(r"abstract|introduction|conclusions?", re.IGNORECASE)
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def split_sections(text: str):
+    starts = [m.start() for m in SECTION_HEADING.finditer(text) if m.start() > 0]
+    bounds = [0] + starts + [len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:]) if text[a:b].strip()]
+
+def _pack(pieces, budget, sep):
+    packed, current = [], ""
+    for piece in pieces:
+        if current and estimate_tokens(current) + estimate_tokens(piece) > budget:
+            packed.append(current)
+            current = ""
+        current = f"{current}{sep}{piece}" if current else piece
+    if current:
+        packed.append(current)
+    return packed
+
+def _split_oversized(section, budget):
+    step = (budget - 1) * CHARS_PER_TOKEN
+    lines = []
+    for line in section.split("\n"):
+        lines.extend(line[i:i + step] for i in range(0, max(len(line), 1), step))
+    return _pack(lines, budget, "\n")
+
+def chunk_text(text: str, budget: int = CHUNK_TOKEN_BUDGET):
+    pieces = []
+    for section in split_sections(text):
+        pieces.extend([section] if estimate_tokens(section) <= budget else _split_oversized(section, budget))
+    return _pack(pieces, budget, "\n")
+
+def truncate_tokens(text: str, budget: int) -> str:
+    limit = budget * CHARS_PER_TOKEN
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + " …"
+
+# Title block plus abstract, introduction and conclusion, each trimmed to an equal share of the budget.
+def compact_paper(text: str, budget: int = COMPACT_EXAMPLE_TOKENS) -> str:
+    sections = split_sections(text)
+    if not sections:
+        return ""
+    keep = sections[:1] + [s for s in sections[1:] if COMPACT_SECTIONS.search(s.split("\n", 1)[0])]
+    share = budget // len(keep)
+    return "\n".join(truncate_tokens(s.strip(), share) for s in keep)
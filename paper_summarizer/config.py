@@ -10,3 +10,65 @@ NUM_FEWSHOTS = 10
 PROMPT_UPDATE_BATCHSIZE = 5
 HUGGINGFACE_REPO_ID = "mistralai/Mistral-7B-Instruct-v0.2"
 HUGGINGFACEHUB_API_TOKEN = os.getenv("HUGGINGFACEHUB_API_TOKEN")
+
+CACHE_DIR = os.getenv("PAPER_SUMMARIZER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "paper_summarizer"))
+PAPER_CACHE_MAX_BYTES = int(os.getenv("PAPER_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+CHARS_PER_TOKEN = 4
+LONG_DOC_TOKEN_THRESHOLD = int(os.getenv("LONG_DOC_TOKEN_THRESHOLD", 6000))
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", 3000))
+MAP_MAX_CONCURRENCY = int(os.getenv("MAP_MAX_CONCURRENCY", 4))
+
+SUMMARY_CACHE_BACKEND = os.getenv("SUMMARY_CACHE_BACKEND", "memory")  # memory | sqlite | file
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", 256))
+
+FEWSHOT_SYNC_INTERVAL = int(os.getenv("FEWSHOT_SYNC_INTERVAL", 300))
+
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", 8192))
+GENERATION_RESERVE_TOKENS = 1024
+FEWSHOT_TOKEN_BUDGET = int(os.getenv("FEWSHOT_TOKEN_BUDGET", 3000))
+COMPACT_EXAMPLE_TOKENS = 600
+
+PROMPT_LATEST_TTL = int(os.getenv("PROMPT_LATEST_TTL", 60))
+PROMPT_FETCH_WORKERS = 5
+
+FEEDBACK_QUEUE_BATCHSIZE = 20
+FEEDBACK_MAX_ATTEMPTS = 8
+FEEDBACK_RETRY_BASE_SECONDS = 2
+
+OPTIMIZER_BATCH_EVENTS = int(os.getenv("OPTIMIZER_BATCH_EVENTS", 10))
+OPTIMIZER_WINDOW_SECONDS = int(os.getenv("OPTIMIZER_WINDOW_SECONDS", 600))
+OPTIMIZER_MAX_BATCH = 50
+OPTIMIZER_FULL_EVENTS = 5  # events rendered in full; the rest of a batch only as rating/comment aggregates
+
+BATCH_FETCH_WORKERS = 4
+BATCH_LLM_WORKERS = 2
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+METRICS_LOG = os.getenv("METRICS_LOG", "false").lower() in ("1", "true", "yes")
+
+PDF_STOP_AT_BACK_MATTER = True
+ARXIV_ID_LIST_BATCH = 100
+ARXIV_DOWNLOAD_WORKERS = 4
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "endpoint")  # endpoint | local
+LOCAL_MODEL_ID = os.getenv("LOCAL_MODEL_ID", HUGGINGFACE_REPO_ID)
+LOCAL_QUANTIZE = os.getenv("LOCAL_QUANTIZE", "true").lower() in ("1", "true", "yes")
+LOCAL_MAX_BATCH = 8
+LOCAL_BATCH_WAIT_MS = 20
+LOCAL_MAX_NEW_TOKENS = GENERATION_RESERVE_TOKENS
+
+DOC_STORE_MEMORY_DOCS = 32
+
+EVAL_SAMPLE_SIZE = 100
+EVAL_MAX_CONCURRENCY = 8
+EVAL_TEMPERATURE = 0.1
+
+LLM_INITIAL_CONCURRENCY = 4
+LLM_MAX_CONCURRENCY = 16
+LLM_MAX_ATTEMPTS = 4
+LLM_RETRY_BASE_SECONDS = 1
+LLM_RETRY_MAX_SECONDS = 20
+LLM_DEADLINE_SECONDS = 120
+LLM_BACKGROUND_DEADLINE_SECONDS = 900
@@ -0,0 +1,51 @@
+import functools
+from paper_summarizer import resources
+from paper_summarizer.config import DOC_STORE_MEMORY_DOCS
+
+# Session messages refer to papers by handle ("arxiv-paper:2404.12345@v2") rather than holding their
+# text. The text lives once in the on-disk paper cache (content-addressed) and, while in use, once in
+# this process's LRU, shared by every session that opened the same paper.
+PREFIX = "arxiv-paper:"
+
+def paper_handle(paper):
+    return f"{PREFIX}{paper['id']}@{paper['version']}"
+
+def is_handle(text):
+    return isinstance(text, str) and text.startswith(PREFIX)
+
+def _parse(handle):
+    paper_id, _, version = handle[len(PREFIX):].rpartition("@")
+    return paper_id, version
+
+def paper_key(handle):
+    return "".join(_parse(handle))
+
+@functools.lru_cache(maxsize=DOC_STORE_MEMORY_DOCS)
+def _load(handle):
+    paper_id, version = _parse(handle)
+    paper = resources.paper_cache().get(paper_id, version)
+    if paper is None:
+        # Evicted from the paper cache since the session stored the handle.
+        from paper_summarizer.arxiv_fetcher import fetch_arxiv_full_text
+        paper = fetch_arxiv_full_text(f"{paper_id}{version}")
+    if paper is None:
+        raise KeyError(f"Paper {paper_id}{version} is no longer available")
+    return paper["content"]
+
+def resolve(text):
+    return _load(text) if is_handle(text) else text
+
+# Runs for every history message on every Streamlit rerun, so it only reads the title from the paper
+# cache's index and never loads or re-downloads the text; an evicted paper shows its bare ID.
+def describe(text):
+    if not is_handle(text):
+        return text
+    metadata = resources.paper_cache().metadata(*_parse(text)) or {}
+    title = metadata.get("Title")
+    return f"arXiv:{paper_key(text)}" + (f" ({title})" if title else "")
+
+# Only the newest turn is sent in full. Earlier papers collapse to a one-line reference, so prior turns
+# reach the LLM as the summaries the assistant already wrote for them.
+def compact_history(messages):
+    *history, (role, content) = messages
+    return [(r, describe(c)) for r, c in history] + [(role, resolve(content))]
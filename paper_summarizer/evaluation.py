@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from paper_summarizer import resources
+from paper_summarizer.config import (
+    CACHE_DIR, DATASET_NAME, EVAL_MAX_CONCURRENCY, EVAL_SAMPLE_SIZE, EVAL_TEMPERATURE, PROMPT_NAME,
+)
+from paper_summarizer.services.llm_scheduler import BACKGROUND
+from paper_summarizer.summarizer import select_few_shots, summarizer_pipeline
+from paper_summarizer.summary_cache import few_shot_hash
+
+SUMMARY = re.compile(r"<summary>(.*?)</summary>", re.DOTALL)
+WORD = re.compile(r"\w+")
+
+
+# Generated outputs keyed by (example, prompt commit, temperature, few-shot hash). Commits are
+# immutable and few-shots are pinned per example for a run, so a rerun only generates pairs it has not
+# seen, e.g. for a newly pushed commit or a larger sample, and regenerates every commit for an example
+# whose few-shots have changed since (the dataset grew), keeping the paired deltas like-for-like.
+class OutputStore:
+    def __init__(self, path=os.path.join(CACHE_DIR, "evaluation.sqlite")):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outputs)")}
+            if columns and "few_shot_hash" not in columns:
+                # Outputs from before few-shots were part of the key cannot be paired reliably.
+                self._conn.execute("DROP TABLE outputs")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS outputs (example_id TEXT, commit_hash TEXT, temperature REAL, few_shot_hash TEXT, "
+                "output TEXT, seconds REAL, PRIMARY KEY (example_id, commit_hash, temperature, few_shot_hash))"
+            )
+
+    def get(self, example_id, commit, temperature, shots_hash):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT output, seconds FROM outputs WHERE example_id = ? AND commit_hash = ? AND temperature = ? AND few_shot_hash = ?",
+                (str(example_id), commit, round(temperature, 2), shots_hash),
+            ).fetchone()
+        return {"output": row[0], "seconds": row[1]} if row else None
+
+    def set(self, example_id, commit, temperature, shots_hash, output, seconds):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?)",
+                (str(example_id), commit, round(temperature, 2), shots_hash, output, seconds),
+            )
+
+
+def extract_summary(text):
+    match = SUMMARY.search(text)
+    return (match.group(1) if match else text).strip()
+
+def _tokens(text):
+    return WORD.findall(text.lower())
+
+def token_f1(prediction, reference):
+    pred, ref = _tokens(prediction), _tokens(reference)
+    overlap = sum((Counter(pred) & Counter(ref)).values())
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / len(pred), overlap / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+def rouge_l(prediction, reference):
+    pred, ref = _tokens(prediction), _tokens(reference)
+    if not pred or not ref:
+        return 0.0
+    # Longest common subsequence, one row at a time.
+    previous = [0] * (len(ref) + 1)
+    for p in pred:
+        current = [0]
+        for j, r in enumerate(ref):
+            current.append(previous[j] + 1 if p == r else max(previous[j + 1], current[j]))
+        previous = current
+    lcs = previous[-1]
+    if not lcs:
+        return 0.0
+    precision, recall = lcs / len(pred), lcs / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+def sample_examples(size, seed=0, dataset_name=DATASET_NAME):
+    examples = [e for e in resources.langsmith_client().list_examples(dataset_name=dataset_name) if e.outputs.get("output")]
+    examples.sort(key=lambda e: str(e.id))
+    return random.Random(seed).sample(examples, min(size, len(examples)))
+
+# Each example's few-shots are chosen once, with the example itself excluded, and shared by every
+# commit, so the only difference between the outputs being compared is the prompt.
+def pin_few_shots(examples):
+    return {e.id: select_few_shots([("user", e.inputs["input"])], exclude=(e.id,)) for e in examples}
+
+def run(examples, commits, temperature=EVAL_TEMPERATURE, concurrency=EVAL_MAX_CONCURRENCY, store=None, stream=sys.stderr):
+    store = store or OutputStore()
+    shots = pin_few_shots(examples)
+    hashes = {example_id: few_shot_hash(s) for example_id, s in shots.items()}
+    todo = [(e, c) for e in examples for c in commits if store.get(e.id, c, temperature, hashes[e.id]) is None]
+    print(f"{len(examples)} examples x {len(commits)} commits, {len(todo)} to generate", file=stream)
+
+    def generate(example, commit):
+        start = time.perf_counter()
+        text, _ = summarizer_pipeline(
+            [("user", example.inputs["input"])], temperature, prompt_commit=commit, few_shots=shots[example.id],
+            feedback_token=False, lane=BACKGROUND,
+        )
+        store.set(example.id, commit, temperature, hashes[example.id], text, time.perf_counter() - start)
+
+    failures = 0
+    with ThreadPoolExecutor(max(1, concurrency)) as pool:
+        futures = {pool.submit(generate, e, c): (e.id, c) for e, c in todo}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                future.result()
+            except Exception as exc:
+                failures += 1
+                print(f"  {futures[future][1]} on {futures[future][0]} failed: {exc!r}", file=stream)
+            if done % 10 == 0 or done == len(futures):
+                print(f"  {done}/{len(futures)} generated", file=stream)
+    return score(examples, commits, temperature, store, hashes), failures
+
+def score(examples, commits, temperature, store, hashes):
+    results = {}
+    for commit in commits:
+        rows = []
+        for example in examples:
+            cached = store.get(example.id, commit, temperature, hashes[example.id])
+            if cached is None:
+                continue
+            prediction, reference = extract_summary(cached["output"]), example.outputs["output"]
+            rows.append((str(example.id), token_f1(prediction, reference), rouge_l(prediction, reference), cached["seconds"]))
+        results[commit] = rows
+    return results
+
+def report(results, stream=sys.stdout):
+    baseline = next(iter(results), None)
+    base = {r[0]: r for r in results.get(baseline, [])}
+    print(f"{'commit':<12} {'n':>5} {'token_f1':>9} {'rouge_l':>8} {'Δf1':>7} {'Δrouge':>7} {'sec':>6}", file=stream)
+    for commit, rows in results.items():
+        n = len(rows) or 1
+        paired = [(r[1] - base[r[0]][1], r[2] - base[r[0]][2]) for r in rows if r[0] in base]
+        delta_f1 = sum(p[0] for p in paired) / len(paired) if paired else 0.0
+        delta_rouge = sum(p[1] for p in paired) / len(paired) if paired else 0.0
+        print(
+            f"{commit:<12} {len(rows):>5} {sum(r[1] for r in rows) / n:>9.4f} {sum(r[2] for r in rows) / n:>8.4f} "
+            f"{delta_f1:>+7.4f} {delta_rouge:>+7.4f} {sum(r[3] for r in rows) / n:>6.1f}",
+            file=stream,
+        )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare prompt commits on a sample of the few-shot dataset.")
+    parser.add_argument("commits", nargs="*", help="prompt commit hashes; the first is the baseline for deltas")
+    parser.add_argument("--last", type=int, default=3, help="with no commits given, evaluate this many of the newest")
+    parser.add_argument("-n", "--sample", type=int, default=EVAL_SAMPLE_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-t", "--temperature", type=float, default=EVAL_TEMPERATURE)
+    parser.add_argument("-c", "--concurrency", type=int, default=EVAL_MAX_CONCURRENCY)
+    parser.add_argument("--json", help="also write per-example scores to this file")
+    args = parser.parse_args(argv)
+
+    # Newest first on the hub; report oldest first so deltas read as "change since the baseline".
+    commits = args.commits or list(reversed(resources.prompt_registry().commits(PROMPT_NAME)[:args.last]))
+    examples = sample_examples(args.sample, args.seed)
+    results, failures = run(examples, commits, args.temperature, args.concurrency)
+    report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({c: [dict(zip(("example_id", "token_f1", "rouge_l", "seconds"), r)) for r in rows] for c, rows in results.items()}, f, indent=2)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,15 @@
 import functools
 from streamlit_feedback import streamlit_feedback
 from paper_summarizer.utils import parse_summary
-from paper_summarizer.config import DATASET_NAME
-from langsmith import Client
+from paper_summarizer.feedback_queue import enqueue_feedback
+from paper_summarizer.metrics import span
 import streamlit as st
 
-
-client = Client()
-
-def handle_feedback(value, presigned_url, original_input, txt):
-    from paper_summarizer.services.langchain_service import update_prompt_from_feedback
-
+def handle_feedback(value, presigned_url, original_input, txt, response=None):
     st.session_state["session_ended"] = True
-    st.write("Thank you for your feedback! Updating summarizer...")
-
-    score = {"👍": 1, "👎": 0}.get(value["score"]) or 0
-    comment = value.get("text")
-
-    client.create_feedback_from_token(presigned_url, score=int(score), comment=comment)
-    if score and original_input and txt:
-        try:
-            client.create_example(
-                inputs={"input": original_input},
-                outputs={"output": txt},
-                dataset_name=DATASET_NAME,
-            )
-        except:
-            client.create_dataset(dataset_name=DATASET_NAME)
-            client.create_example(
-                inputs={"input": original_input},
-                outputs={"output": txt},
-                dataset_name=DATASET_NAME,
-            )
-    if score:
-        update_prompt_from_feedback(value["score"], txt)
+    with span("feedback_enqueue"):
+        enqueue_feedback(value, presigned_url, original_input, txt, response=response)
+    st.write("Thank you for your feedback! The summarizer will be updated in the background.")
 
 def display_feedback_ui(messages, summary_txt, presigned_url, original_input):
     turn_index = len(messages) - 1
@@ -45,6 +21,7 @@ def display_feedback_ui(messages, summary_txt, presigned_url, original_input):
             presigned_url=presigned_url,
             original_input=original_input,
             txt=updated_summary,
+            response=summary_txt,
         ),
         key=f"fb_{turn_index}",
     )
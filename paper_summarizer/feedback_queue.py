@@ -0,0 +1,213 @@
+import functools
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from paper_summarizer.config import (
+    CACHE_DIR, DATASET_NAME, FEEDBACK_MAX_ATTEMPTS, FEEDBACK_QUEUE_BATCHSIZE, FEEDBACK_RETRY_BASE_SECONDS,
+)
+from paper_summarizer import resources
+from paper_summarizer.metrics import count, span
+
+logger = logging.getLogger(__name__)
+
+Event = namedtuple("Event", "id idem_key kind payload attempts created_at")
+
+LEASE_SECONDS = 300
+POLL_SECONDS = 5
+
+
+# Feedback events are committed to SQLite (WAL) before the UI acknowledges them, then drained by a
+# background worker. In-flight rows carry a lease in available_at, so a crashed worker's events are retried.
+class FeedbackQueue:
+    def __init__(self, path=os.path.join(CACHE_DIR, "feedback_queue.sqlite")):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._lock = threading.Lock()
+        self.wakeup = threading.Event()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, idem_key TEXT UNIQUE, "
+                "kind TEXT, payload TEXT, status TEXT, attempts INTEGER, available_at REAL, created_at REAL, last_error TEXT)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, owner TEXT, expires_at REAL)")
+
+    def enqueue(self, kind, payload, idem_key):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO events (idem_key, kind, payload, status, attempts, available_at, created_at) "
+                "VALUES (?, ?, ?, 'pending', 0, ?, ?)",
+                (idem_key, kind, json.dumps(payload), now, now),
+            )
+        self.wakeup.set()
+
+    def claim(self, kinds, limit):
+        now = time.time()
+        marks = ",".join("?" * len(kinds))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT id, idem_key, kind, payload, attempts, created_at FROM events "
+                    f"WHERE kind IN ({marks}) AND status IN ('pending', 'inflight') AND available_at <= ? ORDER BY id LIMIT ?",
+                    (*kinds, now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE events SET status = 'inflight', available_at = ? WHERE id = ?",
+                    [(now + LEASE_SECONDS, r[0]) for r in rows],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [Event(r[0], r[1], r[2], json.loads(r[3]), r[4], r[5]) for r in rows]
+
+    def ack(self, ids):
+        if not ids:
+            return
+        with self._lock:
+            self._conn.execute(f"DELETE FROM events WHERE id IN ({','.join('?' * len(ids))})", list(ids))
+
+    def fail(self, event, error):
+        attempts = event.attempts + 1
+        # Exponential backoff with full jitter; events that keep failing are parked as 'dead' for inspection.
+        delay = random.uniform(0, FEEDBACK_RETRY_BASE_SECONDS * 2 ** attempts)
+        status = "dead" if attempts >= FEEDBACK_MAX_ATTEMPTS else "pending"
+        with self._lock:
+            self._conn.execute(
+                "UPDATE events SET status = ?, attempts = ?, available_at = ?, last_error = ? WHERE id = ?",
+                (status, attempts, time.time() + delay, error, event.id),
+            )
+
+    # Cross-process mutex with expiry, so a crashed holder cannot block others forever.
+    def acquire_lock(self, name, owner, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO locks VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, "
+                "expires_at = excluded.expires_at WHERE locks.expires_at < ? OR locks.owner = excluded.owner",
+                (name, owner, now + ttl, now),
+            )
+            row = self._conn.execute("SELECT owner FROM locks WHERE name = ?", (name,)).fetchone()
+        return row[0] == owner
+
+    def release_lock(self, name, owner):
+        with self._lock:
+            self._conn.execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, owner))
+
+    def stats(self, kind):
+        with self._lock:
+            count, oldest = self._conn.execute(
+                "SELECT COUNT(*), MIN(created_at) FROM events WHERE kind = ? AND status IN ('pending', 'inflight')", (kind,)
+            ).fetchone()
+        return count, oldest
+
+
+HANDLERS = {}
+
+def handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+def _idempotent_id(idem_key):
+    return uuid.uuid5(uuid.NAMESPACE_URL, idem_key)
+
+@functools.lru_cache(maxsize=None)
+def _dataset_id(dataset_name=DATASET_NAME):
+    client = resources.langsmith_client()
+    if client.has_dataset(dataset_name=dataset_name):
+        return client.read_dataset(dataset_name=dataset_name).id
+    return client.create_dataset(dataset_name=dataset_name).id
+
+# The token endpoint takes no feedback id, so duplicates are prevented by the queue itself (unique
+# idem_key, acked once this returns); the key is kept in the metadata to spot a rare double send.
+@handler("feedback")
+def _send_feedback(payload, idem_key):
+    resources.langsmith_client().create_feedback_from_token(
+        payload["presigned_url"], score=payload["score"], comment=payload["comment"], metadata={"idem_key": idem_key}
+    )
+
+@handler("example")
+def _save_example(payload, idem_key):
+    from paper_summarizer.chunking import compact_paper
+    from paper_summarizer.doc_store import resolve
+    from langsmith.utils import LangSmithConflictError
+    example_id = _idempotent_id(idem_key)
+    # The payload holds a doc_store handle (older events may still carry the full text).
+    paper = resolve(payload["input"])
+    compact = compact_paper(paper)
+    try:
+        resources.langsmith_client().create_example(
+            inputs={"input": paper, "compact": compact},
+            outputs={"output": payload["output"]},
+            dataset_id=_dataset_id(),
+            example_id=example_id,
+        )
+    except LangSmithConflictError:
+        pass
+    resources.fewshot_index().add(example_id, compact, payload["output"])
+
+
+class FeedbackWorker(threading.Thread):
+    def __init__(self, queue, kinds):
+        super().__init__(daemon=True, name="feedback-worker")
+        self.queue = queue
+        self.kinds = kinds
+
+    def run(self):
+        while True:
+            events = self.queue.claim(self.kinds, FEEDBACK_QUEUE_BATCHSIZE)
+            if not events:
+                self.queue.wakeup.wait(POLL_SECONDS)
+                self.queue.wakeup.clear()
+                continue
+            done = []
+            for event in events:
+                try:
+                    with span("feedback_handler", kind=event.kind):
+                        HANDLERS[event.kind](event.payload, event.idem_key)
+                    done.append(event.id)
+                    count("feedback_events_total", kind=event.kind, result="ok")
+                except Exception as exc:
+                    count("feedback_events_total", kind=event.kind, result="error")
+                    logger.warning("Feedback event %s (%s) failed: %r", event.id, event.kind, exc)
+                    self.queue.fail(event, repr(exc))
+            self.queue.ack(done)
+
+
+_workers = {}
+_worker_lock = threading.Lock()
+
+def start_worker():
+    from paper_summarizer.optimizer_scheduler import OptimizerScheduler
+    feedback_queue = resources.feedback_queue()
+    factories = {"feedback": lambda: FeedbackWorker(feedback_queue, list(HANDLERS)), "optimizer": lambda: OptimizerScheduler(feedback_queue)}
+    with _worker_lock:
+        for name, factory in factories.items():
+            if name not in _workers or not _workers[name].is_alive():
+                _workers[name] = factory()
+                _workers[name].start()
+
+# Every rating feeds the optimizer, which batches them; only thumbs-up summaries become examples.
+def enqueue_feedback(value, presigned_url, original_input=None, txt=None, conversation=None, response=None):
+    score = {"👍": 1, "👎": 0}.get(value["score"]) or 0
+    comment = value.get("text")
+    feedback_queue = resources.feedback_queue()
+    feedback_queue.enqueue("feedback", {"presigned_url": presigned_url, "score": score, "comment": comment}, f"feedback:{presigned_url}")
+    if score and original_input and txt:
+        feedback_queue.enqueue("example", {"input": original_input, "output": txt}, f"example:{presigned_url}")
+    feedback_queue.enqueue(
+        "optimize",
+        {"score": value["score"], "comment": comment, "output": txt, "response": response, "conversation": conversation},
+        f"optimize:{presigned_url}",
+    )
+    start_worker()
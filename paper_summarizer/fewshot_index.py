@@ -0,0 +1,171 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from paper_summarizer.chunking import compact_paper
+from paper_summarizer.config import CACHE_DIR, DATASET_NAME, FEWSHOT_SYNC_INTERVAL
+from paper_summarizer.metrics import cache_result, span
+
+TOKEN = re.compile(r"[a-z][a-z0-9\-]{2,}")
+STOPWORDS = frozenset(
+    "the and for with that this from are was were which these those their there have has had been not but can "
+    "our its into than then also such using used use based show shows shown paper work propose proposed method "
+    "methods results approach model models et al fig figure table section".split()
+)
+DOC_TERMS = 200
+QUERY_CHARS = 4000
+SCHEMA_VERSION = "2"
+
+
+def _terms(text, limit=DOC_TERMS):
+    counts = Counter(t for t in TOKEN.findall(text.lower()) if t not in STOPWORDS)
+    return dict(counts.most_common(limit))
+
+
+# TF-IDF index over the compact form of the few-shot dataset, persisted in SQLite. Term vectors
+# live in memory for scoring; example text is only read back for the top-k hits.
+class FewShotIndex:
+    def __init__(self, path=os.path.join(CACHE_DIR, "fewshots.sqlite"), sync_interval=FEWSHOT_SYNC_INTERVAL):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.sync_interval = sync_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.RLock()
+        self._syncing = False
+        self._sync_done = threading.Condition(self._lock)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            if self._meta("schema") != SCHEMA_VERSION:
+                self._conn.execute("DROP TABLE IF EXISTS examples")
+                self._conn.execute("DELETE FROM meta")
+                self._set_meta("schema", SCHEMA_VERSION)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS examples (id TEXT PRIMARY KEY, compact TEXT, output TEXT, terms TEXT)")
+        self._docs = {}
+        self._postings = {}
+        self._norms = {}
+        for example_id, terms in self._conn.execute("SELECT id, terms FROM examples"):
+            self._index(example_id, json.loads(terms))
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _index(self, example_id, terms):
+        self._docs[example_id] = terms
+        for term, count in terms.items():
+            self._postings.setdefault(term, {})[example_id] = count
+        self._norms.clear()
+
+    def _unindex(self, example_id):
+        for term in self._docs.pop(example_id, {}):
+            postings = self._postings.get(term, {})
+            postings.pop(example_id, None)
+            if not postings:
+                self._postings.pop(term, None)
+        self._norms.clear()
+
+    def _idf(self, term):
+        return math.log((len(self._docs) + 1) / (len(self._postings.get(term, ())) + 1)) + 1
+
+    def _norm(self, example_id):
+        if example_id not in self._norms:
+            terms = self._docs[example_id]
+            self._norms[example_id] = math.sqrt(sum(((1 + math.log(c)) * self._idf(t)) ** 2 for t, c in terms.items())) or 1.0
+        return self._norms[example_id]
+
+    def _meta(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    def add(self, example_id, compact, summary):
+        example_id = str(example_id)
+        terms = _terms(compact)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO examples VALUES (?, ?, ?, ?)", (example_id, compact, summary, json.dumps(terms)))
+            self._unindex(example_id)
+            self._index(example_id, terms)
+
+    def top_k(self, text, k, exclude=()):
+        exclude = {str(e) for e in exclude}
+        with self._lock:
+            if not self._docs:
+                return []
+            query = _terms(text[:QUERY_CHARS])
+            scores = Counter()
+            for term, count in query.items():
+                idf = self._idf(term)
+                weight = (1 + math.log(count)) * idf * idf
+                for example_id, doc_count in self._postings.get(term, {}).items():
+                    if example_id not in exclude:
+                        scores[example_id] += weight * (1 + math.log(doc_count))
+            ranked = [i for i, _ in sorted(scores.items(), key=lambda s: s[1] / self._norm(s[0]), reverse=True)[:k]]
+            # Papers sharing no vocabulary still get examples, just not ranked ones.
+            ranked += [i for i in sorted(self._docs) if i not in scores and i not in exclude][:k - len(ranked)]
+            rows = {r[0]: r[1:] for r in self._conn.execute(
+                f"SELECT id, compact, output FROM examples WHERE id IN ({','.join('?' * len(ranked))})", ranked)}
+        return [(i, *rows[i]) for i in ranked if i in rows]
+
+    def _merge(self, examples):
+        for example in examples:
+            if str(example.id) not in self._docs:
+                # Examples saved before compact forms existed get theirs computed once, here.
+                compact = example.inputs.get("compact") or compact_paper(example.inputs["input"])
+                self.add(example.id, compact, example.outputs["output"])
+
+    def sync(self, client, dataset_name=DATASET_NAME):
+        if not client.has_dataset(dataset_name=dataset_name):
+            with self._lock, self._conn:
+                self._set_meta("synced_at", time.time())
+            return
+        dataset = client.read_dataset(dataset_name=dataset_name)
+        with self._lock:
+            known = len(self._docs)
+            unchanged = dataset.example_count == known and str(dataset.modified_at) == self._meta("modified_at")
+        if not unchanged and dataset.example_count is not None and dataset.example_count > known:
+            # Examples are listed in creation order, so a grown dataset usually only needs the tail.
+            with span("list_examples", mode="tail"):
+                self._merge(client.list_examples(dataset_name=dataset_name, offset=known))
+        if not unchanged and len(self._docs) != dataset.example_count:
+            with span("list_examples", mode="full"):
+                examples = list(client.list_examples(dataset_name=dataset_name))
+            self._merge(examples)
+            with self._lock, self._conn:
+                for example_id in set(self._docs) - {str(e.id) for e in examples}:
+                    self._conn.execute("DELETE FROM examples WHERE id = ?", (example_id,))
+                    self._unindex(example_id)
+        with self._lock, self._conn:
+            self._set_meta("modified_at", dataset.modified_at)
+            self._set_meta("synced_at", time.time())
+
+    def maybe_sync(self, client, dataset_name=DATASET_NAME):
+        with self._lock:
+            due = time.time() - float(self._meta("synced_at", 0)) > self.sync_interval
+            cache_result("fewshot_index", not due)
+            cold = not self._docs and self._meta("synced_at") is None
+            if due and cold and self._syncing:
+                # Another caller is running the first sync; ranking now would find no examples at all.
+                self._sync_done.wait_for(lambda: not self._syncing)
+                return
+            if not due or self._syncing:
+                return
+            self._syncing = True
+
+        def run():
+            try:
+                self.sync(client, dataset_name)
+            finally:
+                with self._lock:
+                    self._syncing = False
+                    self._sync_done.notify_all()
+
+        # The very first sync has nothing to serve from, so it runs inline.
+        if cold:
+            run()
+        else:
+            threading.Thread(target=run, daemon=True).start()
@@ -0,0 +1,145 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from paper_summarizer.config import METRICS_ENABLED, METRICS_LOG, METRICS_PORT
+
+logger = logging.getLogger("paper_summarizer.metrics")
+
+PREFIX = "paper_summarizer_"
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (64, 256, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+# Counters, gauges and histograms kept in-process and rendered in the Prometheus text format. When metrics
+# are disabled every entry point returns before touching the registry.
+class Registry:
+    def __init__(self):
+        self.enabled = METRICS_ENABLED
+        self.log = METRICS_LOG
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            hist = self._histograms[key]
+            for i, bound in enumerate(hist["buckets"]):
+                if value <= bound:
+                    hist["counts"][i] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()) + sorted(self._gauges.items()):
+                lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+            for (name, labels), hist in sorted(self._histograms.items()):
+                for bound, count in zip(hist["buckets"], hist["counts"]):
+                    lines.append(f"{PREFIX}{name}_bucket{_labels(labels + (('le', bound),))} {count}")
+                lines.append(f"{PREFIX}{name}_bucket{_labels(labels + (('le', '+Inf'),))} {hist['count']}")
+                lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {hist['sum']}")
+                lines.append(f"{PREFIX}{name}_count{_labels(labels)} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}" if labels else ""
+
+registry = Registry()
+
+def count(name, value=1, **labels):
+    if registry.enabled:
+        registry.inc(name, value, **labels)
+
+def gauge(name, value, **labels):
+    if registry.enabled:
+        registry.set(name, value, **labels)
+
+def observe(name, value, buckets=SECONDS_BUCKETS, **labels):
+    if registry.enabled:
+        registry.observe(name, value, buckets, **labels)
+
+def cache_result(cache, hit):
+    if registry.enabled:
+        registry.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+@contextmanager
+def _span(stage, labels):
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe("stage_seconds", elapsed, stage=stage, **labels)
+        if status == "error":
+            registry.inc("stage_errors_total", stage=stage, **labels)
+        if registry.log:
+            logger.info(json.dumps({"event": "span", "stage": stage, "seconds": round(elapsed, 6), "status": status, **labels}))
+
+_NULL_SPAN = nullcontext()
+
+def span(stage, **labels):
+    return _span(stage, labels) if registry.enabled else _NULL_SPAN
+
+def timed(stage, **labels):
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return fn(*args, **kwargs)
+            with _span(stage, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port=METRICS_PORT):
+    global _server
+    if not registry.enabled or not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            except OSError:
+                # Another Streamlit worker on this host already serves the endpoint.
+                return None
+            threading.Thread(target=_server.serve_forever, daemon=True, name="metrics-server").start()
+    return _server
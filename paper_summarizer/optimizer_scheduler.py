@@ -0,0 +1,54 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from paper_summarizer.config import OPTIMIZER_BATCH_EVENTS, OPTIMIZER_MAX_BATCH, OPTIMIZER_WINDOW_SECONDS, PROMPT_NAME
+from paper_summarizer.metrics import count
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 5
+LOCK_TTL_SECONDS = 900
+
+
+# Runs one prompt optimization per window: as soon as OPTIMIZER_BATCH_EVENTS ratings are queued, or the
+# oldest one has waited OPTIMIZER_WINDOW_SECONDS. The queue's lock table keeps a single optimizer per
+# prompt across all processes sharing the queue.
+class OptimizerScheduler(threading.Thread):
+    def __init__(self, queue, prompt_name=PROMPT_NAME, max_events=OPTIMIZER_BATCH_EVENTS, window=OPTIMIZER_WINDOW_SECONDS):
+        super().__init__(daemon=True, name="optimizer-scheduler")
+        self.queue = queue
+        self.prompt_name = prompt_name
+        self.max_events = max_events
+        self.window = window
+        self.owner = f"{os.getpid()}:{uuid.uuid4()}"
+
+    def due(self):
+        count, oldest = self.queue.stats("optimize")
+        return bool(count) and (count >= self.max_events or time.time() - oldest >= self.window)
+
+    def run(self):
+        while True:
+            if self.due() and self.queue.acquire_lock(f"optimize:{self.prompt_name}", self.owner, LOCK_TTL_SECONDS):
+                try:
+                    self.run_batch()
+                finally:
+                    self.queue.release_lock(f"optimize:{self.prompt_name}", self.owner)
+            time.sleep(POLL_SECONDS)
+
+    def run_batch(self):
+        from paper_summarizer.services.langchain_service import update_prompt_from_batch
+        events = self.queue.claim(["optimize"], OPTIMIZER_MAX_BATCH)
+        if not events:
+            return
+        try:
+            update_prompt_from_batch([e.payload for e in events])
+        except Exception as exc:
+            logger.warning("Prompt optimization over %d feedback events failed: %r", len(events), exc)
+            for event in events:
+                self.queue.fail(event, repr(exc))
+            return
+        count("optimizer_batches_total")
+        count("optimizer_events_total", len(events))
+        self.queue.ack([e.id for e in events])
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+from contextlib import suppress
+from glob import glob
+from paper_summarizer.config import CACHE_DIR, PAPER_CACHE_MAX_BYTES
+from paper_summarizer.utils import atomic_write
+
+
+# On-disk cache of extracted paper text. Index entries are keyed by arXiv ID + version
+# and point at content-addressed blobs, so re-uploads of identical text share storage.
+class PaperCache:
+    def __init__(self, root=os.path.join(CACHE_DIR, "papers"), max_bytes=PAPER_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Bytes of blobs as of the last full scan plus the blobs this process wrote since; None until
+        # the first write scans the directory. Writes by other processes sharing the cache are only
+        # seen at the next scan, which runs whenever this estimate goes over max_bytes.
+        self._total = None
+
+    def _index_path(self, key):
+        return os.path.join(self.root, "index", key.replace("/", "_") + ".json")
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest)
+
+    def _resolve(self, paper_id, version=None):
+        if version:
+            path = self._index_path(f"{paper_id}{version}")
+            return path if os.path.exists(path) else None
+        # No explicit version: serve the newest version we have, which keeps lookups offline.
+        candidates = glob(self._index_path(f"{paper_id}v*"))
+        versions = [(int(m.group(1)), p) for p in candidates if (m := re.search(r"v(\d+)\.json$", p))]
+        return max(versions)[1] if versions else None
+
+    def _read_blob(self, digest):
+        with open(self._blob_path(digest), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m, memoryview(m) as view:
+                return str(view, "utf-8")
+
+    def has(self, paper_id, version=None):
+        return self._resolve(paper_id, version) is not None
+
+    # Index entry only, without reading the text or refreshing the entry's LRU position.
+    def metadata(self, paper_id, version=None):
+        path = self._resolve(paper_id, version)
+        if not path:
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)["metadata"] or {}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def get(self, paper_id, version=None):
+        path = self._resolve(paper_id, version)
+        if not path:
+            return None
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            content = self._read_blob(entry["sha256"])
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return {"id": entry["id"], "version": entry["version"], "content": content, "metadata": entry["metadata"]}
+
+    def put(self, paper_id, version, content, metadata=None):
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        os.makedirs(os.path.join(self.root, "index"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "blobs"), exist_ok=True)
+        with self._lock:
+            if not os.path.exists(self._blob_path(digest)):
+                atomic_write(self._blob_path(digest), data)
+                if self._total is not None:
+                    self._total += len(data)
+            entry = {"id": paper_id, "version": version, "sha256": digest, "metadata": metadata or {}}
+            atomic_write(self._index_path(f"{paper_id}{version}"), json.dumps(entry, default=str).encode("utf-8"))
+            # The full scan below reads every index entry, so it only runs when the cache may be over budget.
+            if self._total is None or self._total > self.max_bytes:
+                self._total = self._evict()
+
+    # Drops least recently used entries until the blobs fit in max_bytes; returns the bytes left.
+    def _evict(self):
+        entries = []
+        for path in glob(self._index_path("*")):
+            try:
+                with open(path) as f:
+                    entries.append((os.stat(path).st_mtime, path, json.load(f)["sha256"]))
+            except (OSError, ValueError, KeyError):
+                continue
+        refs = {}
+        for _, _, digest in entries:
+            refs[digest] = refs.get(digest, 0) + 1
+        sizes = {d: os.path.getsize(self._blob_path(d)) for d in refs if os.path.exists(self._blob_path(d))}
+        total = sum(sizes.values())
+        # Least recently used first; reads bump the index entry's mtime.
+        for _, path, digest in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            with suppress(FileNotFoundError):
+                os.remove(path)
+            refs[digest] -= 1
+            if not refs[digest] and digest in sizes:
+                with suppress(FileNotFoundError):
+                    os.remove(self._blob_path(digest))
+                total -= sizes[digest]
+        return total
@@ -0,0 +1,97 @@
+import re
+import time
+from collections import namedtuple
+from paper_summarizer.chunking import SECTION_HEADING
+from paper_summarizer.config import ARXIV_ID_LIST_BATCH
+from paper_summarizer.metrics import count, observe
+
+Section = namedtuple("Section", "title text page")
+
+# A standalone heading only: optional number or letter, the word, an optional label ("Appendix A",
+# "B.2"), nothing else. Body lines that happen to start with "Appendix" must not end the paper.
+BACK_MATTER = re.compile(
+    r"^(?:(?:\d+(?:\.\d+)*|[A-Z])\.?\s+)?(?:References|Bibliography|Appendix|Appendices)(?:\s+[A-Z0-9](?:\.\d+)*)?\.?:?$",
+    re.IGNORECASE,
+)
+
+
+# Resolves many IDs ("2401.12345", "2401.12345v2", "hep-th/9901001") with one id_list query per
+# ARXIV_ID_LIST_BATCH of them. Unversioned queries map to the newest version returned.
+def lookup(queries):
+    import arxiv
+    client = arxiv.Client(page_size=ARXIV_ID_LIST_BATCH)
+    found = {}
+    for start in range(0, len(queries), ARXIV_ID_LIST_BATCH):
+        batch = queries[start:start + ARXIV_ID_LIST_BATCH]
+        for result in client.results(arxiv.Search(id_list=batch, max_results=len(batch))):
+            short_id = result.get_short_id()
+            base, _, version = short_id.rpartition("v")
+            found[short_id] = result
+            newest = found.get(base)
+            if newest is None or int(version) > int(newest.get_short_id().rpartition("v")[2]):
+                found[base] = result
+    return {q: found.get(q) for q in queries}
+
+def download_pdf(query, dirpath, result=None):
+    if result is None:
+        result = lookup([query])[query]
+    if result is None:
+        return None, None
+    return result.download_pdf(dirpath=dirpath), result_metadata(result)
+
+# The same keys ArxivLoader(load_all_available_meta=True) used, so cached entries stay comparable.
+def result_metadata(result):
+    return {
+        "Published": str(result.updated.date()),
+        "Title": result.title,
+        "Authors": ", ".join(a.name for a in result.authors),
+        "Summary": result.summary,
+        "entry_id": result.entry_id,
+        "published_first_time": str(result.published.date()),
+        "comment": result.comment,
+        "journal_ref": result.journal_ref,
+        "doi": result.doi,
+        "primary_category": result.primary_category,
+        "categories": result.categories,
+        "links": [link.href for link in result.links],
+    }
+
+def iter_pages(doc):
+    for page in doc:
+        start = time.perf_counter()
+        text = page.get_text()
+        observe("pdf_page_extract_seconds", time.perf_counter() - start)
+        count("pdf_pages_total")
+        yield text
+
+# Only the section being read is held in memory; each one is emitted as soon as the next heading shows
+# up, so consumers can work on the abstract while later pages are still being parsed. Section texts
+# start with their heading line and concatenate back to the (possibly truncated) document.
+# Back-matter headings in the first half of page_count pages (e.g. a stray "References" line in a
+# short paper's introduction) are kept as ordinary sections.
+def iter_sections(pages, stop_at_back_matter=True, page_count=None):
+    title, buffer, start_page = "", [], 0
+    for page_no, text in enumerate(pages):
+        pos = 0
+        for match in SECTION_HEADING.finditer(text):
+            buffer.append(text[pos:match.start()])
+            body = "".join(buffer)
+            if body.strip():
+                yield Section(title, body, start_page)
+            heading = match.group(0).strip()
+            if stop_at_back_matter and BACK_MATTER.match(heading) and page_no >= (page_count or 0) // 2:
+                return
+            title, buffer, start_page, pos = heading, [], page_no, match.start()
+        buffer.append(text[pos:])
+    body = "".join(buffer)
+    if body.strip():
+        yield Section(title, body, start_page)
+
+def extract_sections(path, stop_at_back_matter=True):
+    import fitz
+    with fitz.open(path) as doc:
+        yield from iter_sections(iter_pages(doc), stop_at_back_matter, doc.page_count)
+
+# Cached papers are stored as plain text; re-split them so both paths hand out the same shape.
+def sections_from_text(text):
+    return iter_sections([text], stop_at_back_matter=False)
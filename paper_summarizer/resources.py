@@ -0,0 +1,53 @@
+import functools
+import logging
+
+# Process-wide singletons. Streamlit re-executes the app script on every interaction, but these are
+# built once per process on first use, and their (slow) imports are deferred until then, so a rerun
+# only pays for the UI itself. Callers go through the module (`resources.langsmith_client()`) so the
+# getters can be swapped out, e.g. by the benchmark harness.
+
+@functools.lru_cache(maxsize=None)
+def langsmith_client():
+    from langsmith import Client
+    return Client()
+
+@functools.lru_cache(maxsize=None)
+def hub_client():
+    from langchainhub import Client as HubClient
+    return HubClient()
+
+@functools.lru_cache(maxsize=None)
+def prompt_registry():
+    from paper_summarizer.services.prompt_registry import PromptRegistry
+    return PromptRegistry(hub_client=hub_client())
+
+@functools.lru_cache(maxsize=None)
+def fewshot_index():
+    from paper_summarizer.fewshot_index import FewShotIndex
+    return FewShotIndex()
+
+@functools.lru_cache(maxsize=None)
+def summary_cache():
+    from paper_summarizer.config import SUMMARY_CACHE_BACKEND
+    from paper_summarizer.summary_cache import BACKENDS
+    return BACKENDS[SUMMARY_CACHE_BACKEND]()
+
+@functools.lru_cache(maxsize=None)
+def paper_cache():
+    from paper_summarizer.paper_cache import PaperCache
+    return PaperCache()
+
+@functools.lru_cache(maxsize=None)
+def feedback_queue():
+    from paper_summarizer.feedback_queue import FeedbackQueue
+    return FeedbackQueue()
+
+# Once per process: logging, the background feedback/optimizer workers (which also drain anything a
+# previous process left in the queue) and the optional metrics endpoint.
+@functools.lru_cache(maxsize=None)
+def startup():
+    from paper_summarizer.feedback_queue import start_worker
+    from paper_summarizer.metrics import start_metrics_server
+    logging.basicConfig(level=logging.INFO)
+    start_worker()
+    start_metrics_server()
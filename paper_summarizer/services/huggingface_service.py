@@ -1,7 +1,53 @@
-from huggingface_hub import login
-from paper_summarizer.config import HUGGINGFACE_REPO_ID, HUGGINGFACEHUB_API_TOKEN
-from langchain_huggingface import HuggingFaceEndpoint
+import threading
+from paper_summarizer.config import HUGGINGFACE_REPO_ID, HUGGINGFACEHUB_API_TOKEN, LLM_BACKEND, LOCAL_MODEL_ID
+from paper_summarizer.metrics import cache_result, span
+from paper_summarizer.services.llm_scheduler import INTERACTIVE, ScheduledLLM
 
-def get_llm(temperature=1.0):
-    login(HUGGINGFACEHUB_API_TOKEN)
-    return HuggingFaceEndpoint(repo_id=HUGGINGFACE_REPO_ID, task="text-generation", temperature=temperature)
+# Endpoints are pooled per (model, generation parameters) for the life of the process, so every
+# session reuses the same InferenceClient/AsyncInferenceClient and their keep-alive connections.
+# The Hugging Face imports are deferred to the first endpoint so app startup does not pay for them.
+# With LLM_BACKEND=local the pool hands out LocalLLMs instead, which share one quantized CPU model
+# (LOCAL_MODEL_ID) and its batching scheduler. Callers get the pooled model wrapped in a ScheduledLLM
+# for their lane, so every call is admitted by the endpoint's shared scheduler (see llm_scheduler).
+_pool = {}
+_lanes = {}
+_pool_lock = threading.Lock()
+_logged_in = False
+
+def _login():
+    global _logged_in
+    if not _logged_in:
+        from huggingface_hub import login
+        login(HUGGINGFACEHUB_API_TOKEN)
+        _logged_in = True
+
+def _local_llm(temperature, generation_kwargs):
+    from paper_summarizer.services.local_llm import LocalLLM
+    return LocalLLM(repo_id=LOCAL_MODEL_ID, temperature=temperature, **generation_kwargs)
+
+def _endpoint(temperature, repo_id, backend, generation_kwargs):
+    if backend == "local":
+        return _local_llm(temperature, generation_kwargs)
+    with span("llm_login"):
+        _login()
+    from langchain_huggingface import HuggingFaceEndpoint
+    return HuggingFaceEndpoint(repo_id=repo_id, task="text-generation", temperature=temperature, **generation_kwargs)
+
+def get_llm(temperature=1.0, repo_id=HUGGINGFACE_REPO_ID, backend=LLM_BACKEND, lane=INTERACTIVE, **generation_kwargs):
+    key = (backend, repo_id, round(float(temperature), 2), tuple(sorted(generation_kwargs.items())))
+    with _pool_lock:
+        cache_result("llm_pool", key in _pool)
+        if key not in _pool:
+            _pool[key] = _endpoint(temperature, repo_id, backend, generation_kwargs)
+        if (key, lane) not in _lanes:
+            endpoint = LOCAL_MODEL_ID if backend == "local" else repo_id
+            _lanes[(key, lane)] = ScheduledLLM(llm=_pool[key], endpoint=f"{backend}:{endpoint}", lane=lane)
+        return _lanes[(key, lane)]
+
+async def ainvoke_llm(prompt, temperature=1.0, **generation_kwargs):
+    with span("llm_invoke"):
+        return await get_llm(temperature, **generation_kwargs).ainvoke(prompt)
+
+async def astream_llm(prompt, temperature=1.0, **generation_kwargs):
+    async for chunk in get_llm(temperature, **generation_kwargs).astream(prompt):
+        yield chunk
@@ -1,51 +1,135 @@
-import random
+import logging
 from typing import cast
 from paper_summarizer.config import *
-from langchain import hub
-from langchainhub import Client as HubClient
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, SystemMessagePromptTemplate
-from langsmith import Client
 
+from paper_summarizer import resources
 from paper_summarizer.services.huggingface_service import get_llm
+from paper_summarizer.services.llm_scheduler import BACKGROUND
+from paper_summarizer.chunking import estimate_tokens, truncate_tokens
+from paper_summarizer.metrics import TOKEN_BUCKETS, count, observe, span, timed
 
-hub_client = HubClient()
-client = Client()
+logger = logging.getLogger(__name__)
 
-def _format_example(example):
+def _format_example(compact, summary):
     return f"""<example>
     <original>
-    {example.inputs['input']}
+    {compact}
     </original>
     <summary>
-    {example.outputs['output']}
+    {summary}
     </summary>
 </example>"""
 
-def few_shot_examples():
-    if client.has_dataset(dataset_name=DATASET_NAME):
-        examples = list(client.list_examples(dataset_name=DATASET_NAME))
-        if not examples:
-            return ""
-        examples = random.sample(examples, min(len(examples), NUM_FEWSHOTS))
-        return "\n".join([_format_example(e) for e in examples])
-    return ""
-
-def get_prompt_with_fewshots():
-    few_shots = few_shot_examples()
-    prompt = hub.pull(PROMPT_NAME)
+@timed("few_shot_selection")
+def few_shot_examples(query="", token_budget=FEWSHOT_TOKEN_BUDGET, exclude=()):
+    index = resources.fewshot_index()
+    with span("fewshot_sync"):
+        index.maybe_sync(resources.langsmith_client())
+    packed, used = [], 0
+    with span("fewshot_rank"):
+        ranked = index.top_k(query, NUM_FEWSHOTS, exclude)
+    for _, compact, summary in ranked:
+        example = _format_example(compact, summary)
+        cost = estimate_tokens(example)
+        if used + cost <= token_budget:
+            packed.append(example)
+            used += cost
+    observe("prompt_tokens", used, TOKEN_BUCKETS, part="few_shots")
+    return "\n".join(packed)
+
+def latest_prompt_commit():
+    return resources.prompt_registry().latest_commit(PROMPT_NAME)
+
+def get_prompt_with_fewshots(few_shots=None, commit=None):
+    if few_shots is None:
+        few_shots = few_shot_examples()
+    prompt = resources.prompt_registry().pull(PROMPT_NAME, commit)
     return prompt.partial(examples=few_shots)
 
-def update_prompt_from_feedback(score, final_value):
-    updated_prompts = [hub.pull(f"{PROMPT_NAME}:{c['commit_hash']}") for c in hub_client.list_commits(PROMPT_NAME)["commits"][:PROMPT_UPDATE_BATCHSIZE]]
-    optimizer_prompt = hub.pull(OPTIMIZER_PROMPT_NAME)
-    optimizer_llm = get_llm()
-    conversation = f"<rating>User rated this {score}</rating>\n<turn idx=0>\nuser: feedback\n</turn idx=0>"
+def _template(prompt):
+    return cast(SystemMessagePromptTemplate, prompt.messages[0]).prompt.template
 
-    system_template = optimizer_prompt | optimizer_llm | (lambda x: x.split("<improved_prompt>")[1].split("</improved_prompt>")[0].strip())
-    updated_prompt = system_template.invoke({
-        "prompt_versions": "\n\n".join([f"<prompt version={v}>\n{cast(SystemMessagePromptTemplate, p.messages[0]).prompt.template}\n</prompt>" for v, p in zip([c['commit_hash'] for c in hub_client.list_commits(PROMPT_NAME)["commits"][:PROMPT_UPDATE_BATCHSIZE]], updated_prompts)]),
-        "current_prompt": cast(SystemMessagePromptTemplate, updated_prompts[0].messages[0]).prompt.template,
-        "conversation": conversation,
+# render_conversation(budget) builds the feedback block; it gets whatever the context has left after
+# the optimizer's own template, the prompt history and the target summary, so a large feedback
+# window cannot overflow the endpoint.
+@timed("prompt_optimization")
+def _optimize_prompt(render_conversation, final_value):
+    updated_prompts = resources.prompt_registry().recent(PROMPT_NAME, PROMPT_UPDATE_BATCHSIZE)
+    optimizer_prompt = resources.prompt_registry().pull(OPTIMIZER_PROMPT_NAME)
+    optimizer_llm = get_llm(lane=BACKGROUND)
+
+    inputs = {
+        "prompt_versions": "\n\n".join([f"<prompt version={v}>\n{_template(p)}\n</prompt>" for v, p in updated_prompts]),
+        "current_prompt": _template(updated_prompts[0][1]),
         "final_value": final_value,
-    })
-    hub.push(PROMPT_NAME, ChatPromptTemplate.from_messages([("system", updated_prompt), MessagesPlaceholder(variable_name="messages")]))
+    }
+    fixed = estimate_tokens(optimizer_prompt.format(conversation="", **inputs))
+    budget = max(0, MODEL_CONTEXT_TOKENS - GENERATION_RESERVE_TOKENS - fixed)
+    conversation = truncate_tokens(render_conversation(budget), budget)
+    observe("prompt_tokens", fixed + estimate_tokens(conversation), TOKEN_BUCKETS, part="optimizer")
+
+    system_template = optimizer_prompt | optimizer_llm | (lambda x: x.split("<improved_prompt>")[1].split("</improved_prompt>")[0].strip())
+    updated_prompt = system_template.invoke({**inputs, "conversation": conversation})
+    resources.prompt_registry().push(PROMPT_NAME, ChatPromptTemplate.from_messages([("system", updated_prompt), MessagesPlaceholder(variable_name="messages")]))
+    resources.summary_cache().clear()
+
+def update_prompt_from_feedback(score, final_value, conversation=None):
+    conversation = f"<rating>User rated this {score}</rating>\n" + (conversation or "<turn idx=0>\nuser: feedback\n</turn idx=0>")
+    _optimize_prompt(lambda budget: conversation, final_value)
+
+def _edited(event):
+    return bool(event.get("response") and event.get("output") and event["response"].strip() != event["output"].strip())
+
+# One event within `budget` tokens. The session transcript repeats the assistant's output, so it is
+# only included for events that carry no summary of their own.
+def _format_feedback(i, event, budget):
+    lines = [f"rating: {event['score']}"]
+    if event.get("comment"):
+        lines.append(f"comment: {truncate_tokens(event['comment'], budget // 8)}")
+        budget -= estimate_tokens(lines[-1])
+    if _edited(event):
+        share = max(0, budget // 2 - 8)
+        lines.append(f"model output:\n{truncate_tokens(event['response'], share)}\nuser-edited summary:\n{truncate_tokens(event['output'], share)}")
+    elif event.get("output"):
+        lines.append(f"summary:\n{truncate_tokens(event['output'], max(0, budget - 8))}")
+    elif event.get("conversation"):
+        lines.append(truncate_tokens(event["conversation"], max(0, budget - 8)))
+    return f"<feedback idx={i}>\n" + "\n".join(lines) + f"\n</feedback idx={i}>"
+
+# One optimizer call for a whole window of feedback events (see optimizer_scheduler). Up to
+# OPTIMIZER_FULL_EVENTS of them are shown in full, edited 👍 summaries first, then other 👍, then the
+# newest of the rest; the others only contribute their rating and comment. A window without a single
+# 👍 has no summary to steer towards, so it is skipped (and its events acked) rather than pushing a
+# prompt commit and clearing the summary cache for nothing.
+def update_prompt_from_batch(events):
+    liked = [e for e in events if e["score"] == "👍"]
+    if not liked:
+        logger.info("Skipping prompt optimization: none of %d feedback events is 👍", len(events))
+        count("optimizer_skipped_batches_total")
+        return False
+    ranked = sorted(range(len(events)), key=lambda i: (events[i]["score"] != "👍", not _edited(events[i]), -i))
+    full = sorted(ranked[:OPTIMIZER_FULL_EVENTS])
+    rest = [e for i, e in enumerate(events) if i not in full]
+
+    def render(budget):
+        lines = [f"<rating>{len(liked)} of {len(events)} users rated their summary 👍</rating>"]
+        comments = [f"- {e['score']} {truncate_tokens(e['comment'], 60)}" for e in rest if e.get("comment")]
+        # Comments from the events not shown in full, newest first, within a quarter of the budget.
+        used = estimate_tokens(lines[0])
+        kept = []
+        for comment in reversed(comments):
+            if used + estimate_tokens(comment) > budget // 4:
+                break
+            kept.append(comment)
+            used += estimate_tokens(comment)
+        if kept:
+            lines.append("<other_comments>\n" + "\n".join(kept) + "\n</other_comments>")
+            used += 8
+        share = max(0, (budget - used) // len(full) - 16)
+        lines.extend(_format_feedback(i, events[i], share) for i in full)
+        return "\n".join(lines)
+
+    final_value = next((e["output"] for e in reversed(liked) if e.get("output")), "")
+    _optimize_prompt(render, final_value)
+    return True
@@ -0,0 +1,307 @@
+import asyncio
+import functools
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+from paper_summarizer.config import (
+    LLM_BACKGROUND_DEADLINE_SECONDS, LLM_DEADLINE_SECONDS, LLM_INITIAL_CONCURRENCY, LLM_MAX_ATTEMPTS,
+    LLM_MAX_CONCURRENCY, LLM_RETRY_BASE_SECONDS, LLM_RETRY_MAX_SECONDS,
+)
+from paper_summarizer.metrics import count, gauge, observe
+
+logger = logging.getLogger(__name__)
+
+# Lanes in priority order: a waiting interactive summary is always admitted before background work
+# (prompt optimization, batch runs, evaluation).
+INTERACTIVE, BACKGROUND = "interactive", "background"
+LANES = {INTERACTIVE: 0, BACKGROUND: 1}
+DEADLINES = {INTERACTIVE: LLM_DEADLINE_SECONDS, BACKGROUND: LLM_BACKGROUND_DEADLINE_SECONDS}
+
+OVERLOAD_STATUS = (429, 502, 503, 504)
+
+
+class LLMUnavailable(RuntimeError):
+    """The endpoint stayed overloaded for every attempt the request was allowed."""
+
+
+class DeadlineExceeded(LLMUnavailable, TimeoutError):
+    """The request's deadline passed while it was queued or backing off."""
+
+
+# Seconds the server asked us to wait (0 if it did not say) when exc means the endpoint is overloaded
+# or timed out, and None for errors a retry would not fix.
+def overload_delay(exc):
+    if isinstance(exc, DeadlineExceeded):
+        return None
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "status_code", None)
+    message = str(exc).lower()
+    if status in OVERLOAD_STATUS:
+        try:
+            return float((getattr(response, "headers", None) or {}).get("Retry-After"))
+        except (TypeError, ValueError):
+            return 0.0
+    if isinstance(exc, TimeoutError) or "timeout" in type(exc).__name__.lower() or "timed out" in message:
+        return 0.0
+    if status is None and ("429" in message or "too many requests" in message):
+        return 0.0
+    return None
+
+
+class _Waiter:
+    def __init__(self, lane, seq, wake):
+        self.lane = lane
+        self.key = (LANES[lane], seq)
+        self.wake = wake
+        self.granted = False
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+# Admission control in front of one inference endpoint. At most `limit` requests are in flight; the
+# limit grows by one per window of successes and halves on a 429 or timeout (AIMD), so the app
+# settles just below what the endpoint can serve instead of failing a burst. Waiters are admitted
+# strictly by lane, then FIFO. Overloaded attempts are retried with full-jitter exponential backoff
+# until the request's deadline; a stream is only retried before its first chunk.
+# Slots are handed to waiters directly, so threads (call/stream) and asyncio tasks (acall/astream)
+# share one queue and an async caller never ties up a thread while it waits.
+class LLMScheduler:
+    def __init__(self, name, initial=LLM_INITIAL_CONCURRENCY, max_limit=LLM_MAX_CONCURRENCY, max_attempts=LLM_MAX_ATTEMPTS,
+                 base_delay=LLM_RETRY_BASE_SECONDS, max_delay=LLM_RETRY_MAX_SECONDS):
+        self.name = name
+        self.limit = float(initial)
+        self.max_limit = max_limit
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self._waiting = []
+        self._seq = itertools.count()
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def _publish(self):
+        gauge("llm_queue_depth", len(self._waiting), endpoint=self.name)
+        gauge("llm_in_flight", self.in_flight, endpoint=self.name)
+        gauge("llm_concurrency_limit", round(self.limit, 2), endpoint=self.name)
+
+    # Called with the lock held whenever a slot may have opened up or a waiter arrived.
+    def _dispatch(self):
+        while self._waiting and self.in_flight < int(self.limit):
+            waiter = heapq.heappop(self._waiting)
+            waiter.granted = True
+            self.in_flight += 1
+            waiter.wake()
+        self._publish()
+
+    def _enqueue(self, lane, wake):
+        waiter = _Waiter(lane, next(self._seq), wake)
+        with self._lock:
+            heapq.heappush(self._waiting, waiter)
+            self._dispatch()
+        return waiter
+
+    # Takes a waiter that gave up out of the queue. Returns True if it was granted a slot in the
+    # meantime, which the caller then owns.
+    def _abandon(self, waiter):
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiting.remove(waiter)
+            heapq.heapify(self._waiting)
+            self._publish()
+        count("llm_requests_total", endpoint=self.name, lane=waiter.lane, outcome="deadline")
+        return False
+
+    def _admitted(self, lane, start):
+        observe("llm_queue_wait_seconds", time.monotonic() - start, endpoint=self.name, lane=lane)
+
+    def _deadline_exceeded(self, lane, start):
+        return DeadlineExceeded(f"{lane} request to {self.name} waited {time.monotonic() - start:.1f}s for a slot")
+
+    def acquire(self, lane, deadline):
+        start = time.monotonic()
+        admitted = threading.Event()
+        waiter = self._enqueue(lane, admitted.set)
+        if not admitted.wait(max(0.0, deadline - start)) and not self._abandon(waiter):
+            raise self._deadline_exceeded(lane, start)
+        self._admitted(lane, start)
+
+    async def aacquire(self, lane, deadline):
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        admitted = loop.create_future()
+        waiter = self._enqueue(lane, lambda: loop.call_soon_threadsafe(_resolve, admitted))
+        try:
+            await asyncio.wait_for(asyncio.shield(admitted), max(0.0, deadline - start))
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                raise self._deadline_exceeded(lane, start) from None
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                self.release(lane, "cancelled")
+            raise
+        self._admitted(lane, start)
+
+    def release(self, lane, outcome):
+        with self._lock:
+            self.in_flight -= 1
+            if outcome == "ok":
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif outcome == "overload":
+                # Requests already in flight when the endpoint pushed back will fail too; count them as
+                # one congestion signal rather than halving once per request.
+                now = time.monotonic()
+                if now - self._last_decrease > self.base_delay:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_decrease = now
+                    logger.info("LLM endpoint %s overloaded, concurrency limit now %d", self.name, int(self.limit))
+            self._dispatch()
+        count("llm_requests_total", endpoint=self.name, lane=lane, outcome=outcome)
+
+    def _retry_delay(self, attempt, retry_after, deadline, lane, exc):
+        if attempt + 1 >= self.max_attempts:
+            raise LLMUnavailable(f"{self.name} still overloaded after {self.max_attempts} attempts") from exc
+        delay = max(retry_after, random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+        if time.monotonic() + delay >= deadline:
+            raise DeadlineExceeded(f"{lane} request to {self.name} ran out of time retrying") from exc
+        count("llm_retries_total", endpoint=self.name, lane=lane)
+        return delay
+
+    def call(self, fn, lane=INTERACTIVE, timeout=None):
+        deadline = time.monotonic() + (timeout or DEADLINES[lane])
+        for attempt in itertools.count():
+            self.acquire(lane, deadline)
+            try:
+                result = fn()
+            except Exception as exc:
+                retry_after = overload_delay(exc)
+                self.release(lane, "error" if retry_after is None else "overload")
+                if retry_after is None:
+                    raise
+                time.sleep(self._retry_delay(attempt, retry_after, deadline, lane, exc))
+                continue
+            except BaseException:
+                self.release(lane, "cancelled")
+                raise
+            self.release(lane, "ok")
+            return result
+
+    async def acall(self, fn, lane=INTERACTIVE, timeout=None):
+        deadline = time.monotonic() + (timeout or DEADLINES[lane])
+        for attempt in itertools.count():
+            await self.aacquire(lane, deadline)
+            try:
+                result = await fn()
+            except Exception as exc:
+                retry_after = overload_delay(exc)
+                self.release(lane, "error" if retry_after is None else "overload")
+                if retry_after is None:
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt, retry_after, deadline, lane, exc))
+                continue
+            except BaseException:
+                self.release(lane, "cancelled")
+                raise
+            self.release(lane, "ok")
+            return result
+
+    # The slot is held until the stream is exhausted or closed. Once a chunk has reached the caller a
+    # retry would repeat it, so failures past that point are raised as they are.
+    def stream(self, produce, lane=INTERACTIVE, timeout=None):
+        deadline = time.monotonic() + (timeout or DEADLINES[lane])
+        for attempt in itertools.count():
+            self.acquire(lane, deadline)
+            outcome, started, error = "cancelled", False, None
+            try:
+                for chunk in produce():
+                    started = True
+                    yield chunk
+                outcome = "ok"
+                return
+            except Exception as exc:
+                retry_after = overload_delay(exc)
+                outcome = "error" if retry_after is None else "overload"
+                if started or retry_after is None:
+                    raise
+                error = exc
+            finally:
+                self.release(lane, outcome)
+            time.sleep(self._retry_delay(attempt, retry_after, deadline, lane, error))
+
+    async def astream(self, produce, lane=INTERACTIVE, timeout=None):
+        deadline = time.monotonic() + (timeout or DEADLINES[lane])
+        for attempt in itertools.count():
+            await self.aacquire(lane, deadline)
+            outcome, started, error = "cancelled", False, None
+            try:
+                async for chunk in produce():
+                    started = True
+                    yield chunk
+                outcome = "ok"
+                return
+            except Exception as exc:
+                retry_after = overload_delay(exc)
+                outcome = "error" if retry_after is None else "overload"
+                if started or retry_after is None:
+                    raise
+                error = exc
+            finally:
+                self.release(lane, outcome)
+            await asyncio.sleep(self._retry_delay(attempt, retry_after, deadline, lane, error))
+
+
+@functools.lru_cache(maxsize=None)
+def get_scheduler(name):
+    return LLMScheduler(name)
+
+
+# Wraps a pooled LLM so every call, streamed or batched, sync or async, is admitted through its
+# endpoint's scheduler. It calls the inner model's _call/_stream/_acall/_astream directly, so
+# LangSmith still records a single LLM run and async calls keep using the endpoint's async client.
+class ScheduledLLM(LLM):
+    llm: Any
+    endpoint: str
+    lane: str = INTERACTIVE
+    timeout: Optional[float] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return self.llm._llm_type
+
+    @property
+    def _identifying_params(self):
+        return {**self.llm._identifying_params, "lane": self.lane}
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        return get_scheduler(self.endpoint).call(
+            lambda: self.llm._call(prompt, stop=stop, run_manager=run_manager, **kwargs), self.lane, self.timeout
+        )
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        yield from get_scheduler(self.endpoint).stream(
+            lambda: self.llm._stream(prompt, stop=stop, run_manager=run_manager, **kwargs), self.lane, self.timeout
+        )
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        return await get_scheduler(self.endpoint).acall(
+            lambda: self.llm._acall(prompt, stop=stop, run_manager=run_manager, **kwargs), self.lane, self.timeout
+        )
+
+    async def _astream(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[GenerationChunk]:
+        async for chunk in get_scheduler(self.endpoint).astream(
+            lambda: self.llm._astream(prompt, stop=stop, run_manager=run_manager, **kwargs), self.lane, self.timeout
+        ):
+            yield chunk
@@ -0,0 +1,193 @@
+import functools
+import logging
+import queue
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+from paper_summarizer.config import (
+    LOCAL_BATCH_WAIT_MS, LOCAL_MAX_BATCH, LOCAL_MAX_NEW_TOKENS, LOCAL_QUANTIZE, MODEL_CONTEXT_TOKENS,
+)
+from paper_summarizer.metrics import TOKEN_BUCKETS, count, observe
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class _Request:
+    def __init__(self, prompt, temperature, max_new_tokens, stop):
+        self.prompt = prompt
+        self.temperature = temperature
+        self.max_new_tokens = max_new_tokens
+        self.stop = stop or []
+        self.chunks = queue.Queue()
+        self.tokens = []
+        self.text = ""
+        self.done = False
+        self.enqueued_at = time.perf_counter()
+
+    # Decodes the whole sequence so far and emits only the new suffix, which keeps multi-token
+    # characters intact. Returns True once a stop sequence has been produced.
+    def emit(self, tokenizer, token_id):
+        self.tokens.append(token_id)
+        text = tokenizer.decode(self.tokens, skip_special_tokens=True)
+        hits = [text.find(s, max(0, len(self.text) - len(s))) for s in self.stop]
+        hits = [h for h in hits if h >= 0]
+        if hits:
+            text = text[:min(hits)]
+        if text.startswith(self.text) and len(text) > len(self.text):
+            self.chunks.put(text[len(self.text):])
+        self.text = text
+        return bool(hits)
+
+    def finish(self, error=None):
+        if not self.done:
+            self.done = True
+            self.chunks.put(error if error else _DONE)
+
+
+# One model per process, driven by a single thread. Requests that arrive within LOCAL_BATCH_WAIT_MS of
+# each other (up to LOCAL_MAX_BATCH) are left-padded into one batch and decoded together: every step is
+# a single forward pass over the whole batch, with per-request temperature and stop handling.
+class BatchScheduler(threading.Thread):
+    def __init__(self, repo_id, quantize=LOCAL_QUANTIZE, max_batch=LOCAL_MAX_BATCH, wait_ms=LOCAL_BATCH_WAIT_MS):
+        super().__init__(daemon=True, name="local-llm-scheduler")
+        self.repo_id = repo_id
+        self.quantize = quantize
+        self.max_batch = max_batch
+        self.wait = wait_ms / 1000
+        self.requests = queue.Queue()
+        self.model = None
+        self.tokenizer = None
+
+    def _load(self):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(self.repo_id)
+        self.tokenizer.padding_side = "left"
+        # Upstream budgets use the chars/4 estimate, so a prompt can still run over the context. Drop
+        # its start (system prompt, few-shots) rather than the paper's end and the [/INST] cue.
+        self.tokenizer.truncation_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        model = AutoModelForCausalLM.from_pretrained(self.repo_id, torch_dtype=torch.float32)
+        if self.quantize:
+            # int8 weights for every Linear layer; activations are quantized on the fly.
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model.eval()
+
+    def submit(self, request):
+        self.requests.put(request)
+
+    def _next_batch(self):
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        try:
+            self._load()
+        except Exception as exc:
+            logger.exception("Could not load local model %s", self.repo_id)
+            while True:
+                self.requests.get().finish(exc)
+        while True:
+            batch = self._next_batch()
+            now = time.perf_counter()
+            for request in batch:
+                observe("local_llm_queue_seconds", now - request.enqueued_at)
+            observe("local_llm_batch_size", len(batch), (1, 2, 4, 8, 16, 32))
+            try:
+                self._generate(batch)
+            except Exception as exc:
+                logger.exception("Local generation failed for a batch of %d", len(batch))
+                for request in batch:
+                    request.finish(exc)
+
+    def _generate(self, batch):
+        import torch
+        max_input = MODEL_CONTEXT_TOKENS - max(r.max_new_tokens for r in batch)
+        enc = self.tokenizer([r.prompt for r in batch], return_tensors="pt", padding=True, truncation=True, max_length=max_input)
+        attention = enc.attention_mask
+        input_ids = enc.input_ids
+        truncated = int((attention.sum(-1) >= max_input).sum())
+        if truncated:
+            count("local_llm_truncated_prompts_total", truncated)
+            logger.warning("%d prompt(s) exceeded %d tokens and lost their beginning", truncated, max_input)
+        observe("prompt_tokens", int(attention.sum()), TOKEN_BUCKETS, part="local_batch")
+        temperatures = torch.tensor([max(r.temperature, 1e-5) for r in batch]).unsqueeze(1)
+        sample = torch.tensor([r.temperature > 0 for r in batch])
+        past = None
+        with torch.inference_mode():
+            for step in range(max(r.max_new_tokens for r in batch)):
+                positions = (attention.cumsum(-1) - 1).clamp(min=0)
+                if past is not None:
+                    positions = positions[:, -1:]
+                out = self.model(input_ids=input_ids, attention_mask=attention, position_ids=positions, past_key_values=past, use_cache=True)
+                past = out.past_key_values
+                logits = out.logits[:, -1, :].float()
+                greedy = logits.argmax(-1)
+                sampled = torch.multinomial(torch.softmax(logits / temperatures, -1), 1).squeeze(1)
+                next_ids = torch.where(sample, sampled, greedy)
+                for i, request in enumerate(batch):
+                    if request.done:
+                        continue
+                    token_id = int(next_ids[i])
+                    if token_id == self.tokenizer.eos_token_id or request.emit(self.tokenizer, token_id) or step + 1 >= request.max_new_tokens:
+                        request.finish()
+                count("local_llm_tokens_total", sum(not r.done for r in batch))
+                if all(r.done for r in batch):
+                    return
+                input_ids = next_ids.unsqueeze(1)
+                attention = torch.cat([attention, torch.ones_like(input_ids)], dim=1)
+        for request in batch:
+            request.finish()
+
+
+@functools.lru_cache(maxsize=None)
+def get_scheduler(repo_id):
+    scheduler = BatchScheduler(repo_id)
+    scheduler.start()
+    return scheduler
+
+
+# Same Runnable interface as HuggingFaceEndpoint (invoke/stream/batch and their async variants), so
+# prompts can be piped into it unchanged. Concurrent calls from any thread share the model's batches.
+class LocalLLM(LLM):
+    repo_id: str
+    temperature: float = 1.0
+    max_new_tokens: int = LOCAL_MAX_NEW_TOKENS
+
+    @property
+    def _llm_type(self) -> str:
+        return "local-transformers"
+
+    @property
+    def _identifying_params(self):
+        return {"repo_id": self.repo_id, "temperature": self.temperature, "max_new_tokens": self.max_new_tokens}
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        request = _Request(prompt, kwargs.get("temperature", self.temperature), kwargs.get("max_new_tokens", self.max_new_tokens), stop)
+        get_scheduler(self.repo_id).submit(request)
+        while True:
+            chunk = request.chunks.get()
+            if chunk is _DONE:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            if run_manager:
+                run_manager.on_llm_new_token(chunk)
+            yield GenerationChunk(text=chunk)
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, **kwargs))
@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.load import dumpd, load
+from paper_summarizer.config import CACHE_DIR, PROMPT_FETCH_WORKERS, PROMPT_LATEST_TTL
+from paper_summarizer.metrics import cache_result, span
+from paper_summarizer.utils import atomic_write
+
+
+# Hub commits are immutable, so pulled templates are cached (in memory and on disk) forever.
+# Only the commit list, whose head is "latest", expires; it is refreshed in the background and
+# falls back to the on-disk snapshot when the hub cannot be reached. `hub_client` lists commits and
+# `hub` pulls/pushes templates; both default to LangChain Hub, imported on first use.
+class PromptRegistry:
+    def __init__(self, root=os.path.join(CACHE_DIR, "prompts"), latest_ttl=PROMPT_LATEST_TTL, hub_client=None, hub=None):
+        self.root = root
+        self.latest_ttl = latest_ttl
+        self._hub_client = hub_client
+        self._hub = hub
+        self._prompts = {}
+        self._commits = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @property
+    def hub_client(self):
+        if self._hub_client is None:
+            from langchainhub import Client as HubClient
+            self._hub_client = HubClient()
+        return self._hub_client
+
+    @property
+    def hub(self):
+        if self._hub is None:
+            from langchain import hub
+            self._hub = hub
+        return self._hub
+
+    def _path(self, name, filename):
+        return os.path.join(self.root, name.replace("/", "__"), filename)
+
+    def _read_snapshot(self, name, filename):
+        try:
+            with open(self._path(name, filename)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_snapshot(self, name, filename, data):
+        path = self._path(name, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, json.dumps(data).encode("utf-8"))
+
+    def refresh(self, name):
+        with span("hub_list_commits"):
+            hashes = [c["commit_hash"] for c in self.hub_client.list_commits(name)["commits"]]
+        with self._lock:
+            self._commits[name] = (hashes, time.time())
+        self._write_snapshot(name, "commits.json", hashes)
+        return hashes
+
+    def _refresh_in_background(self, name):
+        with self._lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+
+        def run():
+            try:
+                self.refresh(name)
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._refreshing.discard(name)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def commits(self, name):
+        with self._lock:
+            cached = self._commits.get(name)
+        if cached:
+            hashes, fetched_at = cached
+            if time.time() - fetched_at > self.latest_ttl:
+                self._refresh_in_background(name)
+            return hashes
+        try:
+            return self.refresh(name)
+        except Exception:
+            hashes = self._read_snapshot(name, "commits.json")
+            if not hashes:
+                raise
+            with self._lock:
+                # Stamped as stale so the next call retries the hub in the background.
+                self._commits[name] = (hashes, 0)
+            return hashes
+
+    def latest_commit(self, name):
+        return self.commits(name)[0]
+
+    def pull(self, name, commit=None):
+        commit = commit or self.latest_commit(name)
+        with self._lock:
+            prompt = self._prompts.get((name, commit))
+        if prompt is not None:
+            cache_result("prompt", True)
+            return prompt
+        snapshot = self._read_snapshot(name, f"{commit}.json")
+        cache_result("prompt", snapshot is not None)
+        if snapshot is not None:
+            prompt = load(snapshot)
+        else:
+            with span("hub_pull"):
+                prompt = self.hub.pull(f"{name}:{commit}")
+            self._write_snapshot(name, f"{commit}.json", dumpd(prompt))
+        with self._lock:
+            self._prompts[(name, commit)] = prompt
+        return prompt
+
+    def pull_many(self, name, commits):
+        with ThreadPoolExecutor(max_workers=PROMPT_FETCH_WORKERS) as pool:
+            return list(pool.map(lambda c: self.pull(name, c), commits))
+
+    def recent(self, name, n):
+        hashes = self.commits(name)[:n]
+        return list(zip(hashes, self.pull_many(name, hashes)))
+
+    def push(self, name, prompt):
+        with span("hub_push"):
+            url = self.hub.push(name, prompt)
+        self.refresh(name)
+        return url
+
@@ -0,0 +1,99 @@
+import threading
+from paper_summarizer.metrics import count
+
+
+# The result of one in-flight call, as a broadcast buffer: chunks are kept for the life of the flight,
+# so a waiter that joins late still replays the stream from the start.
+class Flight:
+    def __init__(self, owner=None):
+        self.owner = owner
+        self.chunks = []
+        self.value = None
+        self.error = None
+        self.done = False
+        self._cond = threading.Condition()
+
+    def publish(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, value=None, error=None):
+        with self._cond:
+            self.value, self.error, self.done = value, error, True
+            self._cond.notify_all()
+
+    def __iter__(self):
+        seen = 0
+        while True:
+            with self._cond:
+                while seen >= len(self.chunks) and not self.done:
+                    self._cond.wait()
+                pending, done, error = self.chunks[seen:], self.done, self.error
+            seen += len(pending)
+            yield from pending
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+    def wait(self):
+        for _ in self:
+            pass
+        return self.value
+
+
+# Concurrent callers with the same key share one execution: the first becomes the leader and runs it,
+# the others wait on its flight. Flights are forgotten as soon as they land, so this only coalesces
+# calls that overlap in time; caching is left to the callers.
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key, owner=None):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight(owner)
+        count("singleflight_total", group=self.name, role="leader" if leader else "follower")
+        return flight, leader
+
+    def _land(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def do(self, key, fn):
+        flight, leader = self._join(key)
+        if not leader:
+            return flight.wait()
+        try:
+            value = fn()
+            flight.finish(value=value)
+            return value
+        except BaseException as exc:
+            flight.finish(error=exc)
+            raise
+        finally:
+            self._land(key, flight)
+
+    # The leader's iterator is drained on a background thread rather than by the leader's caller, so
+    # followers are not stalled if that caller (e.g. a closed browser tab) stops reading.
+    def stream(self, key, produce, owner=None):
+        flight, leader = self._join(key, owner)
+        if leader:
+            def run():
+                try:
+                    for chunk in produce():
+                        flight.publish(chunk)
+                    flight.finish()
+                except BaseException as exc:
+                    flight.finish(error=exc)
+                finally:
+                    self._land(key, flight)
+
+            threading.Thread(target=run, daemon=True, name=f"singleflight-{self.name}").start()
+        return flight, leader
@@ -1,21 +1,173 @@
 from paper_summarizer.config import *
-from paper_summarizer.services.langchain_service import get_prompt_with_fewshots
+from paper_summarizer import doc_store, resources
+from paper_summarizer.chunking import chunk_text, estimate_tokens
+from paper_summarizer.services.langchain_service import few_shot_examples, get_prompt_with_fewshots, latest_prompt_commit
 from paper_summarizer.services.huggingface_service import get_llm
+from paper_summarizer.services.llm_scheduler import INTERACTIVE
+from paper_summarizer.metrics import TOKEN_BUCKETS, cache_result, observe, span
+from paper_summarizer.singleflight import SingleFlight
+from paper_summarizer.summary_cache import summary_cache_key
 from langchain_core.output_parsers import StrOutputParser
-from langsmith import Client
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from datetime import datetime, timezone
+import logging
+import time
 import uuid
 
-client = Client()
+logger = logging.getLogger(__name__)
+summary_flights = SingleFlight("summary")
 
-def summarizer_pipeline(messages, temperature=1.0):
-    run_id = uuid.uuid4()
-    llm = get_llm(temperature)
-    prompt = get_prompt_with_fewshots()
-    summarizer = (prompt | llm | StrOutputParser()).with_config(run_name="Summarizer")
-    write_stream = summarizer.stream({"messages": [tuple(msg[:2]) for msg in messages]}, config={"run_id": run_id})
+MAP_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are reading one part of a longer research paper. Summarize the problem, methods, "
+               "results and claims that appear in this part, concisely and factually. Do not add commentary."),
+    ("user", "{chunk}"),
+])
 
-    full_response = ""
-    for chunk in write_stream:
-        full_response += chunk
-    presigned = client.create_presigned_feedback_token(run_id, feedback_key="summary_quality")
-    return full_response, presigned.url
+def _map_reduce(messages, temperature, lane=INTERACTIVE):
+    *history, (role, content) = messages
+    mapper = (MAP_PROMPT | get_llm(temperature, lane=lane) | StrOutputParser()).with_config(run_name="Summarizer Map")
+    # BaseLLM.batch generates its prompts one after another, so the chunks are fanned out here; the
+    # executor carries the tracing context into its threads.
+    with span("map_reduce_map"), ContextThreadPoolExecutor(MAP_MAX_CONCURRENCY) as pool:
+        partials = list(pool.map(lambda c: mapper.invoke({"chunk": c}), chunk_text(content)))
+    parts = "\n\n".join(f"<part idx={i}>\n{p.strip()}\n</part idx={i}>" for i, p in enumerate(partials))
+    reduced = f"The paper is too long to read in one pass. These are summaries of its consecutive parts; summarize the whole paper from them.\n\n{parts}"
+    return history + [(role, reduced)]
+
+def _fewshot_budget(messages):
+    # Long papers are reduced by map-reduce, so they never occupy more than the threshold.
+    paper_tokens = min(sum(estimate_tokens(m[1]) for m in messages), LONG_DOC_TOKEN_THRESHOLD)
+    return max(0, min(FEWSHOT_TOKEN_BUDGET, MODEL_CONTEXT_TOKENS - GENERATION_RESERVE_TOKENS - paper_tokens))
+
+# The few-shot block a summary of these messages would use; exclude keeps dataset examples out.
+def select_few_shots(messages, exclude=()):
+    return few_shot_examples(messages[-1][1], _fewshot_budget(messages), exclude)
+
+def _log_shared_run(run_id, paper_key, summary, source_run_id, **metadata):
+    # Cache hits and coalesced waiters get their own run so each presigned feedback token still lands
+    # somewhere in LangSmith.
+    now = datetime.now(timezone.utc)
+    resources.langsmith_client().create_run(
+        name="Summarizer",
+        run_type="chain",
+        inputs={"paper": paper_key},
+        outputs={"output": summary},
+        id=run_id,
+        start_time=now,
+        end_time=now,
+        extra={"metadata": {**metadata, "source_run_id": source_run_id}},
+    )
+
+# Iterating yields summary chunks as the LLM produces them; once exhausted, the stream carries the full
+# text, the presigned feedback URL and its latency stats (time to first token, tokens/sec).
+# exclude_examples keeps those dataset examples out of the few-shots (e.g. the one being evaluated),
+# and feedback_token=False skips minting a presigned URL nobody will use. Offline callers pass
+# lane=BACKGROUND so their LLM calls queue behind interactive sessions (see llm_scheduler), and can
+# pin few_shots (from select_few_shots) so several prompt commits see the same examples.
+class SummaryStream:
+    def __init__(self, messages, temperature=1.0, paper_key=None, prompt_commit=None, exclude_examples=(), feedback_token=True,
+                 lane=INTERACTIVE, few_shots=None):
+        self.run_id = uuid.uuid4()
+        messages = [tuple(msg[:2]) for msg in messages]
+        # Papers arrive as doc_store handles; only the newest one is expanded to its full text.
+        self.messages = doc_store.compact_history(messages)
+        self.temperature = temperature
+        last = messages[-1][1]
+        self.paper_key = paper_key or (doc_store.paper_key(last) if doc_store.is_handle(last) else None)
+        self.prompt_commit = prompt_commit
+        self.exclude_examples = tuple(exclude_examples)
+        self.feedback_token = feedback_token
+        self.lane = lane
+        self.few_shots = few_shots
+        self.text = ""
+        self.presigned_url = None
+        self.cache_hit = False
+        self.coalesced = False
+        self.chunks = 0
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+
+    @property
+    def time_to_first_token(self):
+        return self.first_token_at - self.started_at if self.first_token_at else None
+
+    @property
+    def tokens_per_sec(self):
+        # The endpoint streams one token per chunk.
+        if not self.finished_at or not self.first_token_at or self.finished_at == self.first_token_at:
+            return None
+        return self.chunks / (self.finished_at - self.first_token_at)
+
+    def _generate(self):
+        messages = self.messages
+        commit = self.prompt_commit or latest_prompt_commit()
+        few_shots = self.few_shots if self.few_shots is not None else select_few_shots(messages, self.exclude_examples)
+        cache_key = summary_cache_key(self.paper_key, commit, few_shots, self.temperature, messages[:-1]) if self.paper_key else None
+        cached = resources.summary_cache().get(cache_key) if cache_key else None
+        if cache_key:
+            cache_result("summary", cached is not None)
+        if cached:
+            self.cache_hit = True
+            _log_shared_run(self.run_id, self.paper_key, cached["summary"], cached["run_id"], cache_hit=True)
+            yield cached["summary"]
+            return
+        if not cache_key:
+            yield from self._llm_stream(messages, commit, few_shots, None)
+            return
+
+        # Identical requests in flight at the same time (same paper, prompt, few-shots, temperature and
+        # history) share the first one's generation; the others replay its stream.
+        flight, leader = summary_flights.stream(
+            cache_key, lambda: self._llm_stream(messages, commit, few_shots, cache_key), owner=str(self.run_id)
+        )
+        yield from flight
+        if not leader:
+            self.coalesced = True
+            _log_shared_run(self.run_id, self.paper_key, "".join(flight.chunks), flight.owner, coalesced=True)
+
+    def _llm_stream(self, messages, commit, few_shots, cache_key):
+        llm = get_llm(self.temperature, lane=self.lane)
+        with span("prompt_build"):
+            prompt = get_prompt_with_fewshots(few_shots, commit)
+        paper_tokens = sum(estimate_tokens(m[1]) for m in messages)
+        observe("prompt_tokens", paper_tokens, TOKEN_BUCKETS, part="paper")
+        if messages[-1][0] == "user" and paper_tokens > LONG_DOC_TOKEN_THRESHOLD:
+            with span("map_reduce"):
+                messages = _map_reduce(messages, self.temperature, self.lane)
+        summarizer = (prompt | llm | StrOutputParser()).with_config(run_name="Summarizer")
+        full_response = ""
+        with span("llm_generate"):
+            for chunk in summarizer.stream({"messages": messages}, config={"run_id": self.run_id}):
+                full_response += chunk
+                yield chunk
+        if cache_key:
+            resources.summary_cache().set(cache_key, {"summary": full_response, "run_id": str(self.run_id)})
+
+    def __iter__(self):
+        for chunk in self._generate():
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            self.text += chunk
+            self.chunks += 1
+            yield chunk
+        self.finished_at = time.perf_counter()
+        if self.time_to_first_token is not None:
+            observe("time_to_first_token_seconds", self.time_to_first_token, cache_hit=self.cache_hit)
+        if self.feedback_token:
+            with span("presigned_token"):
+                self.presigned_url = resources.langsmith_client().create_presigned_feedback_token(self.run_id, feedback_key="summary_quality").url
+        logger.info(
+            "Summary %s: ttft=%.2fs tokens/s=%s cache_hit=%s coalesced=%s", self.run_id, self.time_to_first_token or 0.0,
+            f"{self.tokens_per_sec:.1f}" if self.tokens_per_sec else "n/a", self.cache_hit, self.coalesced,
+        )
+
+def stream_summary(messages, temperature=1.0, paper_key=None, prompt_commit=None, **kwargs):
+    return SummaryStream(messages, temperature, paper_key, prompt_commit, **kwargs)
+
+def summarizer_pipeline(messages, temperature=1.0, paper_key=None, **kwargs):
+    stream = stream_summary(messages, temperature, paper_key, **kwargs)
+    for _ in stream:
+        pass
+    return stream.text, stream.presigned_url
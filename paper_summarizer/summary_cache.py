@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from glob import glob
+from paper_summarizer.config import CACHE_DIR, SUMMARY_CACHE_SIZE
+from paper_summarizer.utils import atomic_write
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=SUMMARY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every Streamlit worker on the host.
+class SQLiteBackend:
+    def __init__(self, path=os.path.join(CACHE_DIR, "summaries.sqlite")):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, value TEXT, created_at REAL)")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM summaries WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?)", (key, json.dumps(value), time.time()))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM summaries")
+
+
+class FileBackend:
+    def __init__(self, root=os.path.join(CACHE_DIR, "summaries")):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry["value"] if entry.get("key") == key else None
+
+    def set(self, key, value):
+        atomic_write(self._path(key), json.dumps({"key": key, "value": value}).encode("utf-8"))
+
+    def clear(self):
+        for path in glob(os.path.join(self.root, "*.json")):
+            with suppress(FileNotFoundError):
+                os.remove(path)
+
+
+BACKENDS = {"memory": MemoryBackend, "sqlite": SQLiteBackend, "file": FileBackend}
+
+def few_shot_hash(few_shots):
+    return hashlib.sha256(few_shots.encode("utf-8")).hexdigest()[:16]
+
+def summary_cache_key(paper_key, prompt_commit, few_shots, temperature, history=()):
+    history_hash = hashlib.sha256(json.dumps(list(history)).encode("utf-8")).hexdigest()[:16] if history else "-"
+    return f"{paper_key}|{prompt_commit}|{few_shot_hash(few_shots)}|{float(temperature):.2f}|{history_hash}"
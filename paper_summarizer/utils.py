@@ -1,7 +1,19 @@
+import os
 import re
-import streamlit as st
+import threading
+
+
+# Writes through a per-writer temp file and renames it into place, so concurrent readers (other
+# threads or Streamlit workers sharing the cache directory) never see a partially written file.
+def atomic_write(path, data: bytes):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
 
 def parse_summary(response: str, turn: int, box=None):
+    # Imported here so the caches can use atomic_write without loading Streamlit.
+    import streamlit as st
     box = box or st
     match = re.search(r"(.*?)<summary>(.*?)</summary>(.*?)", response.strip(), re.DOTALL)
     if match: